@@ -0,0 +1,223 @@
+"""
+KOOK适配器吞吐量压测
+
+在本地启动模拟的KOOK服务端，按给定速率与负载比例推送事件，统计：
+- 入站事件吞吐（events/s）
+- 从服务端发出到进入处理回调 / commit_event 的延迟 p50/p99
+- 出站发送吞吐（sends/s）
+- 进程常驻内存（RSS）
+
+用法：
+    python bench/bench_throughput.py --events 20000 --mix kmarkdown=0.8,card=0.2
+    python bench/bench_throughput.py --mode adapter   # 经过 KookPlatformAdapter，需要安装 AstrBot
+"""
+import argparse
+import asyncio
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from kook_adapter import kook_client  # noqa: E402
+from kook_adapter.config import CONNECTION_CONFIG  # noqa: E402
+from mock_kook import MockKookServer, kmarkdown_event, card_event  # noqa: E402
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ("kmarkdown", "card"):
+            raise argparse.ArgumentTypeError(f"未知的负载类型: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)]
+
+
+def rss_mb():
+    """当前RSS与峰值RSS（MB）"""
+    current = 0.0
+    try:
+        with open("/proc/self/statm") as f:
+            current = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError):
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return current, peak
+
+
+class Recorder:
+    """按事件中携带的发出时刻统计延迟"""
+
+    def __init__(self, expected):
+        self.expected = expected
+        self.latencies = []
+        self.done = asyncio.Event()
+        self.first = None
+        self.last = None
+
+    def record(self, d):
+        now = time.perf_counter()
+        sent_at = (d.get("extra") or {}).get("bench_ts")
+        if sent_at is not None:
+            self.latencies.append(now - sent_at)
+        if self.first is None:
+            self.first = now
+        self.last = now
+        if len(self.latencies) >= self.expected:
+            self.done.set()
+
+
+async def produce(server, args):
+    """按速率推送事件，rate 为 0 时尽快推送"""
+    names = list(args.mix)
+    weights = [args.mix[n] for n in names]
+    interval = 1.0 / args.rate if args.rate else 0
+    start = time.perf_counter()
+    for i in range(args.events):
+        kind = random.choices(names, weights)[0]
+        channel = str(2000 + i % args.channels)
+        if kind == "card":
+            d = card_event(channel_id=channel, modules=args.card_modules)
+        else:
+            d = kmarkdown_event(channel_id=channel, text=f"消息 {i} " + "x" * args.text_size)
+        d["extra"]["bench_ts"] = time.perf_counter()
+        await server.emit(d)
+        if interval:
+            delay = start + (i + 1) * interval - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        elif i % 256 == 0:
+            await asyncio.sleep(0)
+
+
+async def run_client(server, args, recorder):
+    async def on_event(data):
+        recorder.record(data["d"])
+
+    client = kook_client.KookClient("bench-token", on_event)
+    if not await client.connect():
+        raise RuntimeError("连接模拟网关失败")
+    return client, client.close
+
+
+async def run_adapter(server, args, recorder):
+    # AstrBot 导入时会在当前目录写入 data/，切换到临时目录避免污染工作区
+    os.chdir(CONNECTION_CONFIG["checkpoint_dir"])
+    try:
+        from kook_adapter.kook_adapter import KookPlatformAdapter
+    except ImportError as e:
+        raise SystemExit(f"adapter 模式需要安装 AstrBot: {e}")
+
+    adapter = KookPlatformAdapter({"id": "bench", "token": "bench-token"}, {}, asyncio.Queue())
+    commit_event = adapter.commit_event
+
+    def timed_commit(event):
+        recorder.record(event.message_obj.raw_message)
+        commit_event(event)
+
+    adapter.commit_event = timed_commit
+    task = asyncio.create_task(adapter.run())
+    while adapter.client is None or adapter.client.state != kook_client.ConnectionState.CONNECTED:
+        if task.done():
+            raise RuntimeError("适配器启动失败")
+        await asyncio.sleep(0.05)
+
+    async def stop():
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    return adapter.client, stop
+
+
+async def bench_sends(client, args):
+    """并发发送消息，统计出站吞吐"""
+    if not args.sends:
+        return 0.0
+    semaphore = asyncio.Semaphore(args.send_concurrency)
+
+    async def send(i):
+        async with semaphore:
+            await client.send_text(str(2000 + i % args.channels), f"回复 {i}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(send(i) for i in range(args.sends)))
+    return args.sends / (time.perf_counter() - start)
+
+
+async def main(args):
+    CONNECTION_CONFIG["checkpoint_dir"] = tempfile.mkdtemp(prefix="kook_bench_")
+    server = MockKookServer()
+    await server.start()
+    kook_client.API_BASE = server.api_base
+    server.api_latency = args.api_latency
+
+    recorder = Recorder(args.events)
+    runner = run_adapter if args.mode == "adapter" else run_client
+    client, stop = await runner(server, args, recorder)
+    # 放开本地速率限制，测量的是适配器本身的开销
+    client.rate_limiter.enabled = False
+    rss_before, _ = rss_mb()
+
+    start = time.perf_counter()
+    await produce(server, args)
+    produced = time.perf_counter() - start
+    try:
+        await asyncio.wait_for(recorder.done.wait(), timeout=args.timeout)
+    except asyncio.TimeoutError:
+        print(f"等待超时：只收到 {len(recorder.latencies)}/{args.events} 个事件")
+    elapsed = (recorder.last or time.perf_counter()) - start
+
+    sends_per_sec = await bench_sends(client, args)
+    rss_after, rss_peak = rss_mb()
+    await stop()
+    await server.stop()
+
+    received = len(recorder.latencies)
+    print(f"模式: {args.mode}  负载: {args.mix}  事件数: {args.events}  速率: {args.rate or '不限'}")
+    print(f"推送耗时: {produced:.2f}s")
+    print(f"入站吞吐: {received / elapsed if elapsed > 0 else 0:.0f} events/s  ({received}/{args.events})")
+    print(f"延迟: p50 {percentile(recorder.latencies, 0.5) * 1000:.2f}ms  "
+          f"p99 {percentile(recorder.latencies, 0.99) * 1000:.2f}ms  "
+          f"max {max(recorder.latencies, default=0) * 1000:.2f}ms")
+    if args.sends:
+        print(f"出站吞吐: {sends_per_sec:.0f} sends/s  ({len(server.sent_messages)} 条)")
+    print(f"RSS: {rss_before:.1f}MB -> {rss_after:.1f}MB  峰值 {rss_peak:.1f}MB")
+    return 0 if received >= args.events else 1
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="KOOK适配器吞吐量压测")
+    parser.add_argument("--mode", choices=("client", "adapter"), default="client",
+                        help="client 只测 KookClient；adapter 经过 KookPlatformAdapter 直到 commit_event")
+    parser.add_argument("--events", type=int, default=10000, help="推送的事件数")
+    parser.add_argument("--rate", type=float, default=0, help="每秒推送的事件数，0 表示不限")
+    parser.add_argument("--mix", type=parse_mix, default={"kmarkdown": 1.0},
+                        help="负载比例，如 kmarkdown=0.8,card=0.2")
+    parser.add_argument("--card-modules", type=int, default=20, help="每张卡片的段落模块数")
+    parser.add_argument("--text-size", type=int, default=64, help="KMarkdown消息的附加长度")
+    parser.add_argument("--channels", type=int, default=16, help="事件分布的频道数")
+    parser.add_argument("--sends", type=int, default=2000, help="出站发送的消息数，0 表示不测")
+    parser.add_argument("--send-concurrency", type=int, default=32, help="出站发送的并发数")
+    parser.add_argument("--api-latency", type=float, default=0.0, help="模拟REST接口的延迟（秒）")
+    parser.add_argument("--timeout", type=float, default=120, help="等待事件处理完毕的最长时间（秒）")
+    return parser
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(build_parser().parse_args())))
@@ -0,0 +1,258 @@
+"""
+本地模拟的KOOK服务端，用于离线压测与故障注入
+
+- HTTP：gateway/index、user/me、user/view、message/create、message/update、
+  direct-message/create、direct-message/update、asset/create
+- WebSocket网关：HELLO / PING / PONG / RESUME / RESUME ACK / RECONNECT，帧使用zlib压缩
+
+用法：
+    server = MockKookServer()
+    await server.start()
+    kook_client.API_BASE = server.api_base
+    await server.emit({"type": 9, ...})
+"""
+import asyncio
+import itertools
+import json
+import time
+import uuid
+import zlib
+from aiohttp import web, WSMsgType
+
+
+class MockKookServer:
+    def __init__(self, host="127.0.0.1", port=0, bot_id="10000"):
+        self.host = host
+        self.port = port
+        self.bot_id = bot_id
+        self.session_id = None
+        self.sn = 0
+        self.history = []  # 当前会话已发出的 (sn, 帧)，用于RESUME补发
+        self.history_size = 10000
+        self.ws = None
+        self._runner = None
+        self._msg_ids = itertools.count(1)
+        self.ws_connected = asyncio.Event()
+
+        # 故障注入开关
+        self.drop_pongs = False         # 不回复PONG
+        self.half_open = False          # 连接保持但不再收发任何帧（半开连接）
+        self.frame_delay = 0.0          # 每个下行帧的额外延迟（秒）
+        self.gateway_failures = 0       # 接下来 N 次 gateway/index 返回5xx
+        self.send_failures = 0          # 接下来 N 次发消息返回5xx
+        self.api_latency = 0.0          # REST接口的额外延迟（秒）
+
+        # 统计
+        self.connections = 0
+        self.resumes = 0
+        self.pings = 0
+        self.pongs = 0
+        self.sent_messages = []         # (时间, 路由, 请求体)
+        self.updates = 0
+        self.gateway_requests = 0
+
+    @property
+    def api_base(self):
+        return f"http://{self.host}:{self.port}/api/v3"
+
+    async def start(self):
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_get("/api/v3/gateway/index", self._gateway_index)
+        app.router.add_get("/api/v3/user/me", self._user_me)
+        app.router.add_get("/api/v3/user/view", self._user_view)
+        app.router.add_post("/api/v3/message/create", self._message_create)
+        app.router.add_post("/api/v3/direct-message/create", self._message_create)
+        app.router.add_post("/api/v3/message/update", self._message_update)
+        app.router.add_post("/api/v3/direct-message/update", self._message_update)
+        app.router.add_post("/api/v3/asset/create", self._asset_create)
+        app.router.add_get("/gateway", self._gateway_ws)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        if not self.port:
+            self.port = site._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self.ws and not self.ws.closed:
+            await self.ws.close()
+        if self._runner:
+            await self._runner.cleanup()
+
+    # ---------- REST ----------
+
+    async def _api_delay(self):
+        if self.api_latency:
+            await asyncio.sleep(self.api_latency)
+
+    @staticmethod
+    def _ok(data):
+        return web.json_response({"code": 0, "message": "操作成功", "data": data})
+
+    async def _gateway_index(self, request):
+        self.gateway_requests += 1
+        await self._api_delay()
+        if self.gateway_failures > 0:
+            self.gateway_failures -= 1
+            return web.Response(status=503)
+        url = f"ws://{self.host}:{self.port}/gateway?compress=1"
+        if request.query.get("resume") == "1":
+            # 客户端在获取网关时带上恢复参数，原样附加到网关地址上
+            url += "".join(f"&{k}={request.query[k]}" for k in ("resume", "sn", "session_id") if k in request.query)
+        return self._ok({"url": url})
+
+    async def _user_me(self, request):
+        return self._ok({"id": self.bot_id, "username": "bench", "bot": True})
+
+    async def _user_view(self, request):
+        return self._ok({"id": request.query.get("user_id"), "roles": []})
+
+    async def _message_create(self, request):
+        await self._api_delay()
+        if self.send_failures > 0:
+            self.send_failures -= 1
+            return web.Response(status=502)
+        body = await request.json()
+        self.sent_messages.append((time.perf_counter(), request.path, body))
+        return self._ok({"msg_id": str(uuid.uuid4()), "msg_timestamp": int(time.time() * 1000)})
+
+    async def _message_update(self, request):
+        await self._api_delay()
+        self.updates += 1
+        return self._ok([])
+
+    async def _asset_create(self, request):
+        await self._api_delay()
+        await request.read()
+        return self._ok({"url": f"https://img.kookapp.cn/assets/{uuid.uuid4().hex}.png"})
+
+    # ---------- WebSocket网关 ----------
+
+    async def _send_frame(self, ws, frame):
+        if self.frame_delay:
+            await asyncio.sleep(self.frame_delay)
+        if self.half_open or ws.closed:
+            return
+        await ws.send_bytes(zlib.compress(json.dumps(frame).encode()))
+
+    async def _gateway_ws(self, request):
+        ws = web.WebSocketResponse(autoping=False, max_msg_size=0)
+        await ws.prepare(request)
+        if self.ws and not self.ws.closed:
+            await self.ws.close()
+        self.ws = ws
+        self.connections += 1
+        self.half_open = False
+
+        resume = request.query.get("resume") == "1"
+        session_id = request.query.get("session_id")
+        if not (resume and session_id == self.session_id):
+            self.session_id = str(uuid.uuid4())
+            self.sn = 0
+            self.history = []
+        await self._send_frame(ws, {"s": 1, "d": {"code": 0, "session_id": self.session_id}})
+        self.ws_connected.set()
+
+        try:
+            async for msg in ws:
+                if self.half_open:
+                    continue
+                if msg.type == WSMsgType.PING:
+                    # 半开连接连协议层的ping也不回应，因此这里手动处理
+                    await ws.pong(msg.data)
+                    continue
+                if msg.type not in (WSMsgType.TEXT, WSMsgType.BINARY):
+                    if msg.type == WSMsgType.PONG:
+                        continue
+                    break
+                data = json.loads(msg.data)
+                signal = data.get("s")
+                if signal == 2:
+                    self.pings += 1
+                    if not self.drop_pongs:
+                        self.pongs += 1
+                        await self._send_frame(ws, {"s": 3})
+                elif signal == 4:
+                    self.resumes += 1
+                    since = data.get("sn", 0)
+                    for sn, frame in self.history:
+                        if sn > since:
+                            await self._send_frame(ws, frame)
+                    await self._send_frame(ws, {"s": 6, "d": {"session_id": self.session_id}})
+        finally:
+            if self.ws is ws:
+                self.ws = None
+                self.ws_connected.clear()
+        return ws
+
+    async def emit(self, d):
+        """向当前连接推送一个事件，返回分配的sn（断线期间的事件仅记入历史，待RESUME补发）"""
+        self.sn += 1
+        d.setdefault("msg_id", f"bench-{next(self._msg_ids)}")
+        frame = {"s": 0, "sn": self.sn, "d": d}
+        self.history.append((self.sn, frame))
+        if len(self.history) > self.history_size:
+            del self.history[: len(self.history) - self.history_size]
+        if self.ws and not self.ws.closed:
+            await self._send_frame(self.ws, frame)
+        return self.sn
+
+    async def send_reconnect(self):
+        """下发RECONNECT指令并断开，服务端会话随之失效"""
+        ws = self.ws
+        if ws and not ws.closed:
+            await ws.send_bytes(zlib.compress(json.dumps({"s": 5, "d": {"code": 41008}}).encode()))
+            await ws.close()
+        self.session_id = None
+
+    async def drop_connection(self):
+        """直接关闭当前连接（模拟网络闪断）"""
+        if self.ws and not self.ws.closed:
+            await self.ws.close()
+
+
+# ---------- 事件负载 ----------
+
+def kmarkdown_event(channel_id="2000", author_id="3000", text="hello", **extra):
+    return {
+        "channel_type": "GROUP",
+        "type": 9,
+        "target_id": channel_id,
+        "author_id": author_id,
+        "content": text,
+        "msg_timestamp": int(time.time() * 1000),
+        "extra": {
+            "type": 9,
+            "guild_id": "1000",
+            "author": {"id": author_id, "username": "user"},
+            "kmarkdown": {"raw_content": text},
+            "mention": [],
+            **extra,
+        },
+    }
+
+
+def card_event(channel_id="2000", author_id="3000", modules=20, **extra):
+    card_modules = [{"type": "header", "text": {"type": "plain-text", "content": "标题"}}]
+    for i in range(modules):
+        card_modules.append({"type": "section", "text": {"type": "kmarkdown", "content": f"第{i}段内容 " * 10}})
+        if i % 5 == 0:
+            card_modules.append({"type": "container", "elements": [
+                {"type": "image", "src": f"https://img.kookapp.cn/assets/{i}.png"}
+            ]})
+    content = json.dumps([{"type": "card", "theme": "secondary", "size": "lg", "modules": card_modules}])
+    return {
+        "channel_type": "GROUP",
+        "type": 10,
+        "target_id": channel_id,
+        "author_id": author_id,
+        "content": content,
+        "msg_timestamp": int(time.time() * 1000),
+        "extra": {
+            "type": 10,
+            "guild_id": "1000",
+            "author": {"id": author_id, "username": "user"},
+            "mention": [],
+            **extra,
+        },
+    }
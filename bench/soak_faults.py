@@ -0,0 +1,261 @@
+"""
+KOOK适配器故障注入浸泡测试
+
+在本地模拟网关上持续推送事件，依次注入故障，测量从注入到发现断线（time-to-detect）
+以及到重新收到事件（time-to-recover）的时间：
+- drop_pongs   网关不再回复PONG，但事件照常下发（事件帧即可证明连接存活，不应断线）
+- half_open    连接保持但不再收发任何帧
+- reconnect    网关下发RECONNECT指令
+- gateway_5xx  断线后 gateway/index 连续返回5xx（应直接使用缓存的网关地址重连）
+- slow_frames  下行帧变慢（不应导致断线）
+
+适配器放弃重连、丢失事件或超出恢复SLO时以非零状态退出。需要安装 AstrBot。
+
+用法：
+    python bench/soak_faults.py --rounds 3 --heartbeat-interval 6 --recover-slo 60
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# AstrBot 导入时会在当前目录写入 data/，切换到临时目录避免污染工作区
+os.chdir(tempfile.mkdtemp(prefix="kook_soak_"))
+
+from kook_adapter import kook_client  # noqa: E402
+from kook_adapter.config import CONNECTION_CONFIG  # noqa: E402
+from kook_adapter.kook_client import ConnectionState  # noqa: E402
+from mock_kook import MockKookServer, kmarkdown_event  # noqa: E402
+
+SCENARIOS = ("drop_pongs", "half_open", "reconnect", "gateway_5xx", "slow_frames")
+LIVE_STATES = (ConnectionState.CONNECTED, ConnectionState.RESUMED)
+
+
+class Soak:
+    def __init__(self, server, adapter, task, args):
+        self.server = server
+        self.adapter = adapter
+        self.task = task
+        self.args = args
+        self.expected = set()
+        self.received = set()
+        self.last_received = 0.0
+        self.last_down = 0.0  # 最近一次离开在线状态的时刻
+        self.failures = []
+        self._producing = True
+        self._watch_state()
+
+    @property
+    def client(self):
+        return self.adapter.client
+
+    def _watch_state(self):
+        """记录状态切换的时刻；断线到重连可能只有几毫秒，轮询状态会漏掉"""
+        client = self.client
+        set_state = client._set_state
+
+        def recording_set_state(state):
+            if client.state in LIVE_STATES and state not in LIVE_STATES:
+                self.last_down = time.monotonic()
+            set_state(state)
+
+        client._set_state = recording_set_state
+
+    def record(self, d):
+        self.received.add(d.get("msg_id"))
+        self.last_received = time.monotonic()
+
+    async def produce(self):
+        """持续推送事件，只在服务端会话存在时推送（RECONNECT后旧会话的事件按协议作废）"""
+        i = 0
+        while self._producing:
+            if self.server.session_id is not None:
+                i += 1
+                d = kmarkdown_event(channel_id=str(2000 + i % 8), text=f"soak {i}")
+                d["msg_id"] = f"soak-{i}"
+                self.expected.add(d["msg_id"])
+                await self.server.emit(d)
+            await asyncio.sleep(1.0 / self.args.rate)
+
+    def check_alive(self):
+        if self.task.done():
+            raise RuntimeError("适配器已停止重连")
+
+    async def wait_until(self, predicate, timeout):
+        deadline = time.monotonic() + timeout
+        while not predicate():
+            self.check_alive()
+            if time.monotonic() > deadline:
+                return False
+            await asyncio.sleep(0.01)
+        return True
+
+    async def run_fault(self, name, inject, restore=None, expect_disconnect=True, duration=0.0):
+        """注入一次故障并测量发现与恢复时间"""
+        await self.wait_until(lambda: self.client.state in LIVE_STATES, self.args.recover_slo)
+        connections = self.server.connections
+        started = time.monotonic()
+        await inject()
+
+        detect = recover = None
+        if expect_disconnect:
+            if await self.wait_until(lambda: self.last_down >= started, self.args.detect_slo):
+                detect = self.last_down - started
+            if restore:
+                await restore()
+            if await self.wait_until(
+                lambda: self.server.connections > connections
+                and self.client.state in LIVE_STATES
+                and self.last_received > started,
+                self.args.recover_slo,
+            ):
+                recover = time.monotonic() - started
+        else:
+            await asyncio.sleep(duration)
+            if restore:
+                await restore()
+            if self.server.connections > connections or self.last_down >= started:
+                self.failures.append(f"{name}: 不应断线却发生了重连")
+
+        if expect_disconnect and detect is None:
+            self.failures.append(f"{name}: {self.args.detect_slo}s 内未发现断线")
+        if expect_disconnect and recover is None:
+            self.failures.append(f"{name}: {self.args.recover_slo}s 内未恢复")
+        fmt = lambda v: "-" if v is None else f"{v:.2f}s"  # noqa: E731
+        print(f"{name:<12} detect {fmt(detect):>8}  recover {fmt(recover):>8}  "
+              f"连接数 {self.server.connections}  RESUME {self.server.resumes}")
+
+    async def scenarios(self):
+        server = self.server
+
+        async def drop_pongs():
+            server.drop_pongs = True
+
+        async def restore_pongs():
+            server.drop_pongs = False
+
+        async def half_open():
+            server.half_open = True
+
+        async def reconnect():
+            await server.send_reconnect()
+
+        async def gateway_5xx():
+            server.gateway_failures = self.args.gateway_failures
+            await server.drop_connection()
+
+        async def slow_frames():
+            server.frame_delay = self.args.slow_frame_delay
+
+        async def restore_frames():
+            server.frame_delay = 0.0
+
+        faults = {
+            "drop_pongs": lambda: self.run_fault(
+                "drop_pongs", drop_pongs, restore_pongs,
+                expect_disconnect=False, duration=self.args.slow_duration,
+            ),
+            "half_open": lambda: self.run_fault("half_open", half_open),
+            "reconnect": lambda: self.run_fault("reconnect", reconnect),
+            "gateway_5xx": lambda: self.run_fault("gateway_5xx", gateway_5xx),
+            "slow_frames": lambda: self.run_fault(
+                "slow_frames", slow_frames, restore_frames,
+                expect_disconnect=False, duration=self.args.slow_duration,
+            ),
+        }
+        for name in self.args.scenarios:
+            await faults[name]()
+
+    async def settle(self):
+        """停止推送，等待剩余事件处理完毕后核对是否丢失"""
+        self._producing = False
+        await self.wait_until(lambda: self.expected <= self.received, self.args.settle)
+        lost = self.expected - self.received
+        if lost:
+            sample = ", ".join(sorted(lost)[:5])
+            self.failures.append(f"丢失 {len(lost)}/{len(self.expected)} 个事件（如 {sample}）")
+
+
+async def main(args):
+    CONNECTION_CONFIG["checkpoint_dir"] = os.getcwd()
+    CONNECTION_CONFIG["heartbeat_interval"] = args.heartbeat_interval
+    CONNECTION_CONFIG["heartbeat_timeout"] = args.heartbeat_timeout
+    CONNECTION_CONFIG["min_stable_connection"] = args.min_stable
+    try:
+        from kook_adapter.kook_adapter import KookPlatformAdapter
+    except ImportError as e:
+        raise SystemExit(f"浸泡测试需要安装 AstrBot: {e}")
+
+    server = MockKookServer()
+    await server.start()
+    kook_client.API_BASE = server.api_base
+
+    adapter = KookPlatformAdapter({"id": "soak", "token": "soak-token"}, {}, asyncio.Queue())
+    task = asyncio.create_task(adapter.run())
+    while adapter.client is None:
+        await asyncio.sleep(0.01)
+    soak = Soak(server, adapter, task, args)
+    commit_event = adapter.commit_event
+
+    def recording_commit(event):
+        soak.record(event.message_obj.raw_message)
+        commit_event(event)
+
+    adapter.commit_event = recording_commit
+    producer = asyncio.create_task(soak.produce())
+
+    try:
+        for round_no in range(1, args.rounds + 1):
+            print(f"--- 第 {round_no}/{args.rounds} 轮 ---")
+            await soak.scenarios()
+        await soak.settle()
+    except RuntimeError as e:
+        soak.failures.append(str(e))
+    finally:
+        soak._producing = False
+        producer.cancel()
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        await server.stop()
+
+    print(f"事件: 推送 {len(soak.expected)}  收到 {len(soak.received & soak.expected)}")
+    if soak.failures:
+        print("失败:")
+        for failure in soak.failures:
+            print(f"  - {failure}")
+        return 1
+    print("全部通过")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="KOOK适配器故障注入浸泡测试")
+    parser.add_argument("--rounds", type=int, default=1, help="所有故障场景重复的轮数")
+    parser.add_argument("--scenarios", type=lambda s: s.split(","), default=list(SCENARIOS),
+                        help=f"要运行的场景，逗号分隔，默认全部: {','.join(SCENARIOS)}")
+    parser.add_argument("--rate", type=float, default=50, help="每秒推送的事件数")
+    parser.add_argument("--heartbeat-interval", type=float, default=6, help="心跳间隔（秒）")
+    parser.add_argument("--heartbeat-timeout", type=float, default=2, help="心跳超时（秒）")
+    parser.add_argument("--min-stable", type=float, default=1,
+                        help="连接稳定时长（秒），各场景间隔更短，避免前一场景的重连计入失败次数")
+    parser.add_argument("--gateway-failures", type=int, default=3, help="gateway_5xx 场景连续失败的次数")
+    parser.add_argument("--slow-frame-delay", type=float, default=0.05, help="slow_frames 场景每帧的延迟（秒）")
+    parser.add_argument("--slow-duration", type=float, default=5,
+                        help="drop_pongs / slow_frames 场景持续时间（秒）")
+    parser.add_argument("--detect-slo", type=float, default=20, help="发现断线的时间上限（秒）")
+    parser.add_argument("--recover-slo", type=float, default=90, help="恢复收事件的时间上限（秒）")
+    parser.add_argument("--settle", type=float, default=15, help="结束时等待剩余事件的时间（秒）")
+    return parser
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(build_parser().parse_args())))
@@ -0,0 +1,230 @@
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+HASH_CHUNK_SIZE = 64 * 1024
+# KOOK资源域名，其余http(s)图片需先转存才能用于卡片
+KOOK_ASSET_HOSTS = ("kookapp.cn", "kaiheila.cn")
+MAX_REHOST_SIZE = 20 * 1024 * 1024
+
+
+def is_kook_asset(url):
+    host = urlparse(url).hostname or ""
+    return any(host == h or host.endswith("." + h) for h in KOOK_ASSET_HOSTS)
+
+
+def _hash_file(path):
+    """流式计算文件的 sha256，不将整个文件读入内存"""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class AssetCache:
+    """内容哈希 -> KOOK资源URL 的持久化缓存，按条数与时间淘汰（LRU）
+
+    put 只修改内存并标记为已修改，由调用方决定何时写盘（见 AssetUploader.flush）。
+    """
+
+    def __init__(self, path=None, max_entries=1000, max_age=30 * 24 * 3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._entries = OrderedDict()  # 内容哈希 -> {"url", "created_at"}
+        self.hits = 0
+        self.misses = 0
+        self.dirty = False  # 内存中有尚未写盘的修改
+        self._load()
+
+    def _load(self):
+        if not self.path:
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            logging.warning(f"[KOOK] 读取资源缓存失败: {e}")
+            return
+        # 文件中按最近使用顺序保存
+        for digest, entry in data.items():
+            self._entries[digest] = entry
+        self._evict()
+
+    def snapshot(self):
+        """取出待写盘的内容（按最近使用顺序），并清除已修改标记"""
+        self.dirty = False
+        return dict(self._entries)
+
+    def write(self, entries):
+        """将 snapshot 的结果写入文件（先写临时文件再替换），可在线程中调用"""
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entries, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logging.warning(f"[KOOK] 写入资源缓存失败: {e}")
+
+    def _evict(self):
+        expire_before = time.time() - self.max_age
+        for digest in [d for d, e in self._entries.items() if e.get("created_at", 0) < expire_before]:
+            del self._entries[digest]
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, digest):
+        entry = self._entries.get(digest)
+        if entry is None or entry.get("created_at", 0) < time.time() - self.max_age:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(digest)
+        self.hits += 1
+        return entry["url"]
+
+    def put(self, digest, url):
+        self._entries[digest] = {"url": url, "created_at": time.time()}
+        self._entries.move_to_end(digest)
+        self._evict()
+        self.dirty = True
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class AssetUploader:
+    """图片上传流水线
+
+    将 Image 组件中的本地文件、file:/// 路径和 base64 图片上传到 KOOK（asset/create），
+    按内容哈希去重并缓存上传结果，重复发送的表情包、梗图无需再次上传。
+    KOOK资源地址直接使用；其他 http(s) 图片（KOOK卡片不接受）先下载再转存，按URL缓存。
+    缓存文件在上传后延迟 save_delay 秒于线程中写入，连续上传只写一次，不阻塞事件循环。
+    """
+
+    def __init__(self, client, cache_path=None, max_entries=1000, max_age=30 * 24 * 3600, save_delay=5.0):
+        self.client = client
+        self.cache = AssetCache(cache_path, max_entries=max_entries, max_age=max_age)
+        self.save_delay = save_delay
+        self._inflight = {}  # 内容哈希 -> 正在进行的上传任务
+        self._save_task = None
+        self._save_lock = asyncio.Lock()  # 同一时间只有一个线程写文件
+        self.uploads = 0
+
+    async def resolve(self, file):
+        """将图片来源解析为KOOK可用的URL，失败时返回 None"""
+        if not file:
+            return None
+        if file.startswith(("http://", "https://")):
+            if is_kook_asset(file):
+                return file
+            return await self._rehost(file)
+
+        try:
+            if file.startswith("base64://"):
+                source = base64.b64decode(file[len("base64://"):])
+                digest = hashlib.sha256(source).hexdigest()
+                filename = "image.png"
+            else:
+                source = file[len("file:///"):] if file.startswith("file:///") else file
+                digest = await asyncio.to_thread(_hash_file, source)
+                filename = os.path.basename(source) or "image.png"
+        except Exception as e:
+            logging.error(f"[KOOK] 读取图片失败: {e}")
+            return None
+
+        url = self.cache.get(digest)
+        if url:
+            return url
+
+        # 同一内容并发上传时只上传一次
+        task = self._inflight.get(digest)
+        if task is None:
+            task = asyncio.ensure_future(self._upload(digest, source, filename))
+            self._inflight[digest] = task
+            task.add_done_callback(lambda _: self._inflight.pop(digest, None))
+        return await asyncio.shield(task)
+
+    async def _rehost(self, url):
+        """转存外部图片，失败时返回原地址（由发送方决定如何降级）"""
+        digest = "url:" + hashlib.sha256(url.encode("utf-8")).hexdigest()
+        cached = self.cache.get(digest)
+        if cached:
+            return cached
+        task = self._inflight.get(digest)
+        if task is None:
+            task = asyncio.ensure_future(self._download_and_upload(digest, url))
+            self._inflight[digest] = task
+            task.add_done_callback(lambda _: self._inflight.pop(digest, None))
+        return await asyncio.shield(task) or url
+
+    async def _download_and_upload(self, digest, url):
+        filename = os.path.basename(urlparse(url).path) or "image.png"
+        fd, path = tempfile.mkstemp(prefix="kook_rehost_")
+        os.close(fd)
+        try:
+            if not await self.client.download_file(url, path, MAX_REHOST_SIZE):
+                return None
+            return await self._upload(digest, path, filename)
+        except Exception as e:
+            logging.error(f"[KOOK] 转存外部图片失败: {url} {e}")
+            return None
+        finally:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    async def _upload(self, digest, source, filename):
+        url = await self.client.upload_asset(source, filename)
+        if url:
+            self.uploads += 1
+            self.cache.put(digest, url)
+            self._schedule_save()
+        return url
+
+    def _schedule_save(self):
+        if self._save_task is None or self._save_task.done():
+            self._save_task = asyncio.ensure_future(self._save_later())
+
+    async def _save_later(self):
+        await asyncio.sleep(self.save_delay)
+        await self.flush()
+
+    async def flush(self):
+        """将尚未写盘的缓存写入文件"""
+        async with self._save_lock:
+            if self.cache.dirty:
+                await asyncio.to_thread(self.cache.write, self.cache.snapshot())
+
+    async def close(self):
+        """取消延迟写盘并立即写入"""
+        if self._save_task and not self._save_task.done():
+            self._save_task.cancel()
+            try:
+                await self._save_task
+            except asyncio.CancelledError:
+                pass
+        self._save_task = None
+        await self.flush()
+
+    def stats(self):
+        return {
+            "cached": len(self.cache),
+            "hits": self.cache.hits,
+            "misses": self.cache.misses,
+            "uploads": self.uploads,
+            "inflight": len(self._inflight),
+        }
@@ -0,0 +1,205 @@
+import os
+from astrbot.api.message_components import Plain, Image, File, Record, Video
+from .codec import json_loads
+
+
+class PrefetchedImage(Image):
+    """仍在预取中的入站图片
+
+    file 为原始URL；需要本地文件或 base64 时等待后台预取完成（同一URL不会重复下载），
+    之后指向本地缓存文件；预取失败时按 Image 的默认方式从URL下载。
+    """
+
+    _media = None
+
+    class Config:
+        underscore_attrs_are_private = True
+
+    def __init__(self, file, media, **_):
+        super().__init__(file=file, **_)
+        self._media = media
+
+    async def _wait_prefetch(self):
+        media, self._media = self._media, None
+        if media is None:
+            return
+        path = await media.fetch(self.file)
+        if path:
+            self.file = f"file:///{os.path.abspath(path)}"
+            self.path = path
+
+    async def convert_to_file_path(self) -> str:
+        await self._wait_prefetch()
+        return await super().convert_to_file_path()
+
+    async def convert_to_base64(self) -> str:
+        await self._wait_prefetch()
+        return await super().convert_to_base64()
+
+
+def _image(url, media):
+    if media is None:
+        return Image(file=url)
+    path = media.cached(url)
+    return Image.fromFileSystem(path) if path else PrefetchedImage(url, media)
+
+
+class CardContent:
+    """卡片消息的解析结果
+
+    text 为全部文本按模块换行拼接的结果；segments 为按原顺序排列的
+    ("text", str) / ("image", url) / ("file", (文件名, url)) / ("audio", url) / ("video", url) 段，
+    只有调用 to_components 时才构建消息组件。
+    """
+
+    __slots__ = ("text", "segments")
+
+    def __init__(self, text, segments):
+        self.text = text
+        self.segments = segments
+
+    def image_urls(self):
+        return [value for kind, value in self.segments if kind == "image"]
+
+    def to_components(self, media=None):
+        """构建消息组件，media 为 MediaPrefetcher 时图片指向预取的本地文件（见 PrefetchedImage）"""
+        components = []
+        for kind, value in self.segments:
+            if kind == "text":
+                components.append(Plain(text=value))
+            elif kind == "image":
+                components.append(_image(value, media))
+            elif kind == "file":
+                name, url = value
+                components.append(File(name=name, url=url))
+            elif kind == "audio":
+                components.append(Record(file=value))
+            elif kind == "video":
+                components.append(Video(file=value))
+        return components
+
+
+class _Collector:
+    """单遍收集文本与媒体，文本先放入列表，最后一次性拼接"""
+
+    __slots__ = ("texts", "segments", "_run")
+
+    def __init__(self):
+        self.texts = []  # 全部文本行
+        self.segments = []
+        self._run = []  # 当前连续的文本行，遇到媒体时归并为一段
+
+    def text(self, value):
+        if value:
+            self.texts.append(value)
+            self._run.append(value)
+
+    def media(self, kind, value):
+        if not value:
+            return
+        self._flush()
+        self.segments.append((kind, value))
+
+    def _flush(self):
+        if self._run:
+            self.segments.append(("text", "\n".join(self._run)))
+            self._run = []
+
+    def result(self):
+        self._flush()
+        return CardContent("\n".join(self.texts), self.segments)
+
+
+# ---------- 元素 ----------
+
+def _element_text(element):
+    """plain-text / kmarkdown / paragraph 元素的文本"""
+    kind = element.get('type')
+    if kind == 'paragraph':
+        return "\n".join(filter(None, (_element_text(field) for field in element.get('fields') or ())))
+    if kind in ('plain-text', 'kmarkdown'):
+        return element.get('content') or ''
+    return ''
+
+
+def _walk_element(element, out):
+    kind = element.get('type')
+    if kind == 'image':
+        out.media("image", element.get('src'))
+    elif kind != 'button':  # 按钮只是交互入口，不属于消息内容
+        out.text(_element_text(element))
+
+
+# ---------- 模块 ----------
+
+def _text_module(module, out):
+    """header / section：文本，以及 section 的附件（图片或按钮）"""
+    out.text(_element_text(module.get('text') or {}))
+    accessory = module.get('accessory')
+    if accessory:
+        _walk_element(accessory, out)
+
+
+def _elements_module(module, out):
+    """container / image-group：图片列表"""
+    for element in module.get('elements') or ():
+        _walk_element(element, out)
+
+
+def _context_module(module, out):
+    """context：同一行的说明文字，其中的图片是图标，不作为消息图片"""
+    parts = [_element_text(element) for element in module.get('elements') or ()]
+    out.text(" ".join(filter(None, parts)))
+
+
+def _file_module(module, out):
+    src = module.get('src')
+    if src:
+        out.media("file", (module.get('title') or src.rsplit('/', 1)[-1], src))
+
+
+def _audio_module(module, out):
+    out.media("audio", module.get('src'))
+
+
+def _video_module(module, out):
+    out.media("video", module.get('src'))
+
+
+def _invite_module(module, out):
+    code = module.get('code')
+    if code:
+        out.text(f"[邀请] {code}")
+
+
+def _ignore(module, out):
+    pass
+
+
+MODULE_HANDLERS = {
+    'header': _text_module,
+    'section': _text_module,
+    'container': _elements_module,
+    'image-group': _elements_module,
+    'context': _context_module,
+    'file': _file_module,
+    'audio': _audio_module,
+    'video': _video_module,
+    'invite': _invite_module,
+    'action-group': _ignore,
+    'divider': _ignore,
+    'countdown': _ignore,
+}
+
+
+def parse_card(content):
+    """单遍解析卡片消息内容（JSON字符串或已解析的对象），返回 CardContent"""
+    cards = json_loads(content) if isinstance(content, (str, bytes)) else content
+    if isinstance(cards, dict):
+        cards = [cards]
+    out = _Collector()
+    for card in cards:
+        for module in card.get('modules') or ():
+            handler = MODULE_HANDLERS.get(module.get('type'), _ignore)
+            handler(module, out)
+    return out.result()
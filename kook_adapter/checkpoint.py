@@ -0,0 +1,66 @@
+import json
+import logging
+import os
+import time
+
+
+class SessionCheckpoint:
+    """会话检查点，将 session_id 与 sn 持久化到本地文件
+
+    进程重启后若仍处于恢复窗口内，可直接 RESUME 而无需冷启动。
+    """
+
+    def __init__(self, path, resume_window=300):
+        self.path = path
+        self.resume_window = resume_window
+        self._saved = None  # 上次写入的内容，避免重复写盘
+        self._saved_at = 0.0
+
+    def load(self):
+        """读取检查点，过期或不存在时返回 (None, 0)"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None, 0
+        except Exception as e:
+            logging.warning(f"[KOOK] 读取会话检查点失败: {e}")
+            return None, 0
+
+        if time.time() - data.get("updated_at", 0) > self.resume_window:
+            logging.info("[KOOK] 会话检查点已过期，将重新建立会话")
+            return None, 0
+        session_id = data.get("session_id")
+        if not session_id:
+            return None, 0
+        return session_id, int(data.get("sn", 0))
+
+    def save(self, session_id, sn, force=False):
+        """写入检查点（先写临时文件再替换，保证原子性）"""
+        if not session_id:
+            return
+        now = time.time()
+        # 内容未变化时仅定期刷新时间戳，保证连接存活期间检查点不过期
+        if not force and self._saved == (session_id, sn) and now - self._saved_at < self.resume_window / 3:
+            return
+        data = {"session_id": session_id, "sn": sn, "updated_at": now}
+        tmp_path = f"{self.path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+            self._saved = (session_id, sn)
+            self._saved_at = now
+        except Exception as e:
+            logging.warning(f"[KOOK] 写入会话检查点失败: {e}")
+
+    def clear(self):
+        """删除检查点"""
+        self._saved = None
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logging.warning(f"[KOOK] 删除会话检查点失败: {e}")
@@ -0,0 +1,152 @@
+import asyncio
+import logging
+import time
+from .config import PERFORMANCE_CONFIG
+from .event_pipeline import EventPipeline
+from .kook_client import create_http_session
+
+# 黄金分割比例，用于将各机器人的心跳相位均匀错开
+_PHASE_STEP = 0.6180339887
+
+
+class _SharedPipelineView:
+    """共享事件流水线在单个客户端上的视图
+
+    事件以 (客户端, 事件) 的形式提交到共享流水线，按 (客户端, 频道) 分片，
+    同一机器人同一频道内保序。流水线的启停由管理器负责。
+    """
+
+    def __init__(self, pipeline, client):
+        self._pipeline = pipeline
+        self._client = client
+
+    @property
+    def running(self):
+        return self._pipeline.running
+
+    def start(self):
+        self._pipeline.start()
+
+    async def stop(self):
+        pass
+
+    async def submit(self, data):
+        return await self._pipeline.submit((self._client, data))
+
+    def stats(self):
+        return self._pipeline.stats()
+
+
+async def _dispatch_shared(item):
+    client, data = item
+    await client._process_event(data)
+
+
+def _drop_shared(item):
+    client, data = item
+    client._event_dropped(data)
+
+
+def _shared_key(item):
+    client, data = item
+    return id(client), (data.get('d') or {}).get('target_id')
+
+
+class KookClientManager:
+    """在同一事件循环中托管多个机器人Token的客户端管理器
+
+    - 所有客户端共用一个HTTP连接池（鉴权头按请求携带，互不影响）；
+    - 所有客户端共用一组事件处理工作协程；
+    - 错开各机器人的建连时间与心跳相位，避免同时发起；
+    - 速率限制桶仍按Token各自维护（每个客户端有自己的 RateLimiter）。
+    """
+
+    def __init__(self, connect_stagger=1.0):
+        self.connect_stagger = connect_stagger
+        self._clients = []
+        self._slots = {}  # 客户端 -> 分配的序号，用于错开心跳相位
+        self._next_slot = 0
+        self._http_session = None
+        self._connect_lock = asyncio.Lock()
+        self._last_connect = 0.0
+        self._last_client = None  # 最近一次建连的客户端
+        self.pipeline = EventPipeline(
+            _dispatch_shared,
+            workers=PERFORMANCE_CONFIG["event_workers"],
+            buffer_size=PERFORMANCE_CONFIG["buffer_size"],
+            policy=PERFORMANCE_CONFIG["queue_full_policy"],
+            key=_shared_key,
+            on_drop=_drop_shared,
+        )
+
+    @property
+    def clients(self):
+        return list(self._clients)
+
+    def register(self, client):
+        """注册客户端（可重复调用）"""
+        if client in self._clients:
+            return
+        self._clients.append(client)
+        self._slots[client] = self._next_slot
+        self._next_slot += 1
+        logging.info(f"[KOOK] 客户端管理器当前托管 {len(self._clients)} 个机器人")
+
+    async def unregister(self, client):
+        """注销客户端，最后一个客户端注销时释放共享资源"""
+        if client not in self._clients:
+            return
+        self._clients.remove(client)
+        self._slots.pop(client, None)
+        if self._last_client is client:
+            self._last_client = None
+        if not self._clients:
+            await self.pipeline.stop()
+            if self._http_session and not self._http_session.closed:
+                await self._http_session.close()
+            self._http_session = None
+
+    def pipeline_for(self, client):
+        return _SharedPipelineView(self.pipeline, client)
+
+    def get_http_session(self):
+        """获取共享的HTTP会话"""
+        if self._http_session is None or self._http_session.closed:
+            self._http_session = create_http_session()
+        return self._http_session
+
+    def heartbeat_offset(self, client, interval):
+        """为客户端分配的心跳相位偏移（秒）"""
+        slot = self._slots.get(client, 0)
+        return (slot * _PHASE_STEP % 1.0) * interval
+
+    async def stagger_connect(self, client):
+        """错开多个机器人的建连时间
+
+        只在与其他机器人的建连相撞时等待；只托管一个机器人，
+        或上一次建连就是它自己（断线重连）时不等待，避免拖慢故障恢复。
+        """
+        async with self._connect_lock:
+            if len(self._clients) > 1 and self._last_client is not client:
+                wait = self._last_connect + self.connect_stagger - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+            self._last_connect = time.monotonic()
+            self._last_client = client
+
+    def stats(self):
+        return {
+            "clients": len(self._clients),
+            "pipeline": self.pipeline.stats(),
+        }
+
+
+_manager = None
+
+
+def get_client_manager():
+    """获取进程内共享的客户端管理器"""
+    global _manager
+    if _manager is None:
+        _manager = KookClientManager(connect_stagger=PERFORMANCE_CONFIG["connect_stagger"])
+    return _manager
@@ -0,0 +1,61 @@
+import json
+import zlib
+
+# 安装了 orjson 时使用更快的 JSON 解析，否则回退到标准库
+try:
+    import orjson
+
+    def json_loads(data):
+        return orjson.loads(data)
+
+    def json_dumps(obj):
+        return orjson.dumps(obj).decode("utf-8")
+
+    JSON_BACKEND = "orjson"
+except ImportError:
+    def json_loads(data):
+        return json.loads(data)
+
+    def json_dumps(obj):
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+    JSON_BACKEND = "json"
+
+# 事件帧中附带的原始报文（解压后的JSON）键名，供按需重新解析
+RAW_FRAME_KEY = "_raw"
+
+
+class FrameDecoder:
+    """WebSocket 帧解码器
+
+    复用同一个解压对象：网关以流式压缩发送时保持上下文，
+    每帧独立压缩时在流结束后从预先创建的空白对象复制一个新的，省去重复初始化。
+    解压后的 bytes 直接交给 JSON 解析，不再先转换为 str。
+    """
+
+    def __init__(self):
+        self._template = zlib.decompressobj()
+        self._decompressor = self._template.copy()
+
+    def decompress(self, frame):
+        """解压一帧二进制数据"""
+        d = self._decompressor
+        data = d.decompress(frame)
+        if d.eof:
+            # 独立压缩的帧，重置上下文以便处理下一帧
+            self._decompressor = self._template.copy()
+        return data
+
+    def reset(self):
+        """连接重建时重置解压上下文"""
+        self._decompressor = self._template.copy()
+
+    def decode(self, frame):
+        """解码一帧数据（bytes 先解压，str 直接解析）为 dict"""
+        return self.decode_with_raw(frame)[1]
+
+    def decode_with_raw(self, frame):
+        """解码一帧数据，返回 (解压后的原始报文, dict)"""
+        if isinstance(frame, bytes):
+            frame = self.decompress(frame)
+        return frame, json_loads(frame)
@@ -7,13 +7,24 @@ KOOK适配器配置文件
 CONNECTION_CONFIG = {
     # 心跳配置
     "heartbeat_interval": 30,  # 心跳间隔（秒）
-    "heartbeat_timeout": 6,    # 心跳超时时间（秒）
+    "heartbeat_timeout": 6,    # 心跳超时时间（秒），自适应等待时间的上限
+    "heartbeat_min_timeout": 1.0,  # 按RTT自适应的心跳等待时间下限（秒）
     "max_heartbeat_failures": 3,  # 最大心跳失败次数
     
     # 重连配置
     "initial_reconnect_delay": 1,  # 初始重连延迟（秒）
     "max_reconnect_delay": 60,     # 最大重连延迟（秒）
-    "max_consecutive_failures": 5,  # 最大连续失败次数
+    "min_stable_connection": 10,   # 连接保持超过该时长（秒）才视为稳定并清零失败计数，否则断开后按退避延迟重连
+    
+    # 会话恢复配置
+    "enable_resume": True,         # 断线后是否优先尝试RESUME恢复会话
+    "checkpoint_dir": None,        # 会话检查点与资源、媒体缓存的保存目录，None 为AstrBot数据目录下的 kook_adapter
+    "checkpoint_interval": 2,      # 检查点写盘间隔（秒）
+    "resume_window": 300,          # 检查点有效期（秒），超过后冷启动
+    
+    # 网关地址预取
+    "gateway_url_ttl": 600,        # 缓存的网关地址的有效期（秒），过期后重新获取
+    "gateway_refresh_interval": 50,  # 后台刷新网关地址的间隔（秒），小于HTTP长连接保活时间
     
     # WebSocket配置
     "websocket_timeout": 10,       # WebSocket接收超时（秒）
@@ -38,14 +49,52 @@ ERROR_HANDLING_CONFIG = {
     "retry_on_token_expired": True,     # Token过期时是否重试
     "max_retry_attempts": 3,            # 最大重试次数
     "retry_delay_base": 2,              # 重试延迟基数（秒）
+    "retry_delay_max": 30,              # 单次重试的最大延迟（秒）
+    "retry_queue_size": 100,            # 待重试消息队列上限
+    "drain_timeout": 10,                # 关闭时等待重试队列排空的最长时间（秒）
 }
 
 # 性能配置
 PERFORMANCE_CONFIG = {
     "enable_message_buffering": True,   # 是否启用消息缓冲
     "buffer_size": 100,                 # 缓冲区大小
+    "event_workers": 4,                 # 事件处理工作协程数（按频道分片）
+    "queue_full_policy": "drop_oldest", # 缓冲区满时的策略：block / drop_oldest / drop_newest
+    "reorder_window": 64,               # sn重排缓冲区大小
+    "reorder_gap_timeout": 1.0,         # 等待缺失sn的最长时间（秒）
+    "dedup_cache_size": 4096,           # msg_id去重缓存条数
+    "dedup_ttl": 600,                   # msg_id去重缓存有效期（秒）
+    "role_cache_ttl": 600,              # 机器人角色缓存有效期（秒）
+    "outbound_workers": 16,             # 主动发送队列的工作协程数（按频道分片）
+    "outbound_queue_size": 1000,        # 主动发送队列大小，满时阻塞调用方
     "enable_connection_pooling": True,  # 是否启用连接池
     "max_concurrent_requests": 10,      # 最大并发请求数
+    "share_client_resources": True,     # 多个机器人是否共享连接池与事件处理协程
+    "connect_stagger": 1.0,             # 多个机器人建连的最小间隔（秒）
+    "keepalive_timeout": 60,            # HTTP长连接保活时间（秒）
+    "dns_cache_ttl": 300,               # DNS缓存时间（秒）
+    "request_timeout": 30,              # HTTP请求总超时（秒）
+}
+
+# 消息发送配置
+MESSAGE_CONFIG = {
+    "max_text_length": 5000,            # 单条KMarkdown/卡片文本段的最大长度，超出时拆分
+    "max_card_modules": 50,             # 单张卡片的最大模块数
+    "max_container_images": 9,          # 单个图片容器的最大图片数
+    "card_theme": "secondary",          # 合并发送时卡片的主题
+    "stream_update_interval": 1.0,      # 流式回复编辑消息的最小间隔（秒）
+    "asset_cache_max_entries": 1000,    # 图片上传缓存的最大条数
+    "asset_cache_max_age": 30 * 24 * 3600,  # 图片上传缓存的有效期（秒）
+    "media_prefetch_enabled": False,    # 是否预取入站消息中的图片并缓存到本地
+    "media_prefetch_concurrency": 8,    # 同时下载的图片数
+    "media_cache_max_bytes": 256 * 1024 * 1024,  # 本地图片缓存的总大小上限（字节）
+    "media_max_file_size": 20 * 1024 * 1024,     # 单张图片的大小上限（字节），超过则不预取
+}
+
+# 事件路由配置
+EVENT_CONFIG = {
+    # 允许处理的事件路由，其余事件在转换前丢弃；system 为加入/退出服务器、表情回应等系统事件
+    "allowed_events": ["text", "kmarkdown", "card", "image", "video", "file", "audio"],
 }
 
 # 安全配置
@@ -54,6 +103,16 @@ SECURITY_CONFIG = {
     "enable_rate_limiting": True,       # 是否启用速率限制
     "rate_limit_requests": 100,         # 速率限制请求数
     "rate_limit_window": 60,            # 速率限制窗口（秒）
+    "max_rate_limit_retries": 3,        # 收到429后排队重发的最大次数
+}
+
+# 监控指标配置
+METRICS_CONFIG = {
+    "enabled": False,                   # 是否采集热路径计数与耗时（关闭时几乎无开销）
+    "exporter_enabled": False,          # 是否启动Prometheus文本格式的指标端点
+    "exporter_host": "127.0.0.1",       # 指标端点监听地址
+    "exporter_port": 9464,              # 指标端点监听端口
+    "exporter_path": "/metrics",        # 指标端点路径
 }
 
 def get_config():
@@ -63,7 +122,10 @@ def get_config():
         "logging": LOGGING_CONFIG,
         "error_handling": ERROR_HANDLING_CONFIG,
         "performance": PERFORMANCE_CONFIG,
+        "message": MESSAGE_CONFIG,
+        "event": EVENT_CONFIG,
         "security": SECURITY_CONFIG,
+        "metrics": METRICS_CONFIG,
     }
 
 def get_connection_config():
@@ -0,0 +1,181 @@
+import asyncio
+import logging
+import random
+import aiohttp
+from collections import deque
+from .metrics import metrics
+
+
+class _Pending:
+    """投递结果：消息已进入重试队列，稍后按频道内的顺序发送"""
+
+    __slots__ = ()
+
+    def __bool__(self):
+        return False
+
+    def __repr__(self):
+        return "PENDING"
+
+
+PENDING = _Pending()
+
+
+class OutboundDelivery:
+    """出站消息投递层
+
+    首次发送在调用方内直接进行；失败时按错误类型分类：
+    5xx、429和网络错误放入有界的重试队列，按带抖动的指数退避重试，
+    4xx（权限不足、参数错误等）和接口业务错误不重试。
+    重试队列按频道（route, target_id）划分：某频道有消息待重试时，该频道之后的消息排在其后依次发送，
+    保证频道内的顺序；调用方立即得到 PENDING，不阻塞发送路径。关闭时可等待队列排空。
+    """
+
+    def __init__(self, client, max_attempts=3, delay_base=2, delay_max=30,
+                 retry_on_network_error=True, queue_size=100):
+        self.client = client
+        self.max_attempts = max_attempts  # 最大重试次数（不含首次发送）
+        self.delay_base = delay_base
+        self.delay_max = delay_max
+        self.retry_on_network_error = retry_on_network_error
+        self.queue_size = queue_size
+        self._queues = {}  # (route, target_id) -> deque[(route, payload, 描述, 上次错误)]
+        self._tasks = set()  # 各频道的重试协程
+        self.delivered = 0
+        self.retried = 0
+        self.failed = 0
+        self.dropped = 0
+
+    async def _attempt(self, route, payload):
+        """发送一次，返回 (接口数据, 是否可重试, 错误描述)"""
+        start = metrics.clock()
+        data, retryable, error = await self._send(route, payload)
+        if metrics.enabled:
+            metrics.observe_since("kook_send_seconds", start, route=route)
+            result = "ok" if error is None else ("retryable" if retryable else "failed")
+            metrics.inc("kook_send_total", route=route, result=result)
+        return data, retryable, error
+
+    async def _send(self, route, payload):
+        try:
+            status, result = await self.client._request("POST", route, json=payload)
+        except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+            return None, self.retry_on_network_error, f"网络异常: {e!r}"
+        if status == 200:
+            if result.get('code') == 0:
+                return result.get('data') or {}, False, None
+            return None, False, f"接口返回错误: {result}"
+        return None, status == 429 or status >= 500, f"HTTP错误: {status}"
+
+    async def deliver(self, route, payload, description="发送消息"):
+        """投递一条请求
+
+        成功返回接口数据；可重试的失败返回 PENDING（消息已进入该频道的重试队列）；
+        不可重试的失败或重试队列已满时返回 None。
+        """
+        key = (route, payload.get("target_id"))
+        queue = self._queues.get(key)
+        if queue is not None:
+            # 该频道有消息在重试，后续消息排在其后，保证频道内的顺序
+            return self._enqueue(key, route, payload, description, None)
+
+        data, retryable, error = await self._attempt(route, payload)
+        if error is None:
+            self.delivered += 1
+            logging.info(f"[KOOK] {description}成功")
+            return data
+        if retryable and self.max_attempts > 0:
+            return self._enqueue(key, route, payload, description, error)
+        self.failed += 1
+        logging.error(f"[KOOK] {description}失败: {error}")
+        return None
+
+    @property
+    def pending(self):
+        return sum(len(queue) for queue in self._queues.values())
+
+    def _backoff(self, attempt):
+        delay = min(self.delay_base * 2 ** (attempt - 1), self.delay_max)
+        return delay * random.uniform(0.5, 1.5)
+
+    def _enqueue(self, key, route, payload, description, error):
+        if self.pending >= self.queue_size:
+            self.dropped += 1
+            logging.error(f"[KOOK] 重试队列已满，放弃{description}: {error or '频道有消息待重试'}")
+            return None
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = deque()
+            task = asyncio.create_task(self._run_queue(key, queue))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        queue.append((route, payload, description, error))
+        return PENDING
+
+    async def _run_queue(self, key, queue):
+        """按顺序发送频道队列中的消息，队首发送成功或最终失败后才发送下一条"""
+        try:
+            while queue:
+                await self._retry(*queue[0])
+                queue.popleft()
+        finally:
+            self._queues.pop(key, None)
+
+    async def _retry(self, route, payload, description, error):
+        if error is None:
+            # 排在重试消息之后的消息，先按正常流程发送一次
+            _, retryable, error = await self._attempt(route, payload)
+            if error is None:
+                self.delivered += 1
+                logging.info(f"[KOOK] {description}成功")
+                return
+            if not retryable:
+                self.failed += 1
+                logging.error(f"[KOOK] {description}失败: {error}")
+                return
+        for attempt in range(1, self.max_attempts + 1):
+            delay = self._backoff(attempt)
+            logging.warning(f"[KOOK] {description}失败，{delay:.1f}秒后第{attempt}次重试: {error}")
+            await asyncio.sleep(delay)
+            self.retried += 1
+            _, retryable, error = await self._attempt(route, payload)
+            if error is None:
+                self.delivered += 1
+                logging.info(f"[KOOK] {description}重试成功")
+                return
+            if not retryable:
+                break
+        self.failed += 1
+        logging.error(f"[KOOK] {description}最终失败: {error}")
+
+    async def drain(self, timeout=None):
+        """等待重试队列排空，超时后放弃剩余的重试"""
+        if not self._tasks:
+            return
+        logging.info(f"[KOOK] 等待 {self.pending} 条消息重试完成")
+        _, pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+        if pending:
+            logging.warning(f"[KOOK] 重试队列未能排空，放弃 {self.pending} 条消息")
+            await self.stop()
+
+    async def stop(self):
+        """取消所有待重试的消息"""
+        self.dropped += self.pending
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._queues.clear()
+
+    def stats(self):
+        return {
+            "pending": self.pending,
+            "delivered": self.delivered,
+            "retried": self.retried,
+            "failed": self.failed,
+            "dropped": self.dropped,
+        }
@@ -0,0 +1,133 @@
+import asyncio
+import logging
+from .metrics import metrics
+
+
+def _event_target(data):
+    return (data.get('d') or {}).get('target_id')
+
+
+class EventPipeline:
+    """事件处理流水线，将WebSocket接收与消息处理解耦
+
+    事件按频道(target_id，可通过 key 自定义)分片到固定的工作协程，同一频道内保持顺序，
+    不同频道之间并发处理。每个分片使用有界队列，队列满时按策略处理：
+    - block: 阻塞接收循环（背压）
+    - drop_oldest: 丢弃该分片中最旧的事件
+    - drop_newest: 丢弃新到达的事件
+    丢弃事件时调用 on_drop(事件)，便于调用方记录这些事件已被放弃。
+    """
+
+    POLICIES = ("block", "drop_oldest", "drop_newest")
+
+    def __init__(self, handler, workers=4, buffer_size=100, policy="drop_oldest", key=None, name="事件",
+                 on_drop=None):
+        if policy not in self.POLICIES:
+            raise ValueError(f"未知的队列溢出策略: {policy}")
+        self.handler = handler
+        self.key = key or _event_target
+        self.name = name
+        self.on_drop = on_drop
+        self.workers = max(1, workers)
+        self.buffer_size = buffer_size
+        self.policy = policy
+        self._queues = []
+        self._tasks = []
+        self.enqueued = 0
+        self.processed = 0
+        self.dropped = 0
+        self.blocked = 0
+        self.errors = 0
+
+    @property
+    def running(self):
+        return bool(self._tasks)
+
+    def start(self):
+        """启动工作协程"""
+        if self._tasks:
+            return
+        shard_size = max(1, self.buffer_size // self.workers)
+        self._queues = [asyncio.Queue(maxsize=shard_size) for _ in range(self.workers)]
+        self._tasks = [
+            asyncio.create_task(self._worker(queue)) for queue in self._queues
+        ]
+
+    async def stop(self):
+        """停止工作协程，未处理的事件将被丢弃"""
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._queues = []
+
+    async def drain(self, timeout=None):
+        """等待队列中已提交的任务处理完毕，返回是否在超时前排空"""
+        if not self._queues:
+            return True
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(q.join() for q in self._queues)), timeout=timeout
+            )
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def submit(self, data):
+        """提交一个任务，返回是否入队成功"""
+        queue = self._queues[hash(self.key(data)) % self.workers]
+
+        if queue.full():
+            if self.policy == "drop_newest":
+                self.dropped += 1
+                logging.warning(f"[KOOK] {self.name}队列已满，丢弃新任务")
+                if self.on_drop:
+                    self.on_drop(data)
+                return False
+            if self.policy == "drop_oldest":
+                _, oldest = queue.get_nowait()
+                queue.task_done()
+                self.dropped += 1
+                if self.on_drop:
+                    self.on_drop(oldest)
+                logging.warning(f"[KOOK] {self.name}队列已满，丢弃最旧的任务")
+            else:
+                self.blocked += 1
+
+        # 连同入队时刻一起排队，用于统计排队等待时间（未启用监控时为0）
+        await queue.put((metrics.clock(), data))
+        self.enqueued += 1
+        return True
+
+    async def _worker(self, queue):
+        while True:
+            queued_at, data = await queue.get()
+            try:
+                start = metrics.clock()
+                if start:
+                    metrics.observe("kook_pipeline_wait_seconds", start - queued_at, pipeline=self.name)
+                await self.handler(data)
+                metrics.observe_since("kook_pipeline_handle_seconds", start, pipeline=self.name)
+                self.processed += 1
+            except Exception as e:
+                self.errors += 1
+                logging.error(f"[KOOK] {self.name}处理异常: {e}")
+            finally:
+                queue.task_done()
+
+    def stats(self):
+        """获取流水线统计信息"""
+        return {
+            "workers": self.workers,
+            "policy": self.policy,
+            "queue_depth": sum(q.qsize() for q in self._queues),
+            "enqueued": self.enqueued,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "blocked": self.blocked,
+            "errors": self.errors,
+        }
@@ -0,0 +1,99 @@
+SYSTEM_EVENT_TYPE = 255
+
+# 消息类型（d.type）
+TEXT_MESSAGE = 1
+IMAGE_MESSAGE = 2
+VIDEO_MESSAGE = 3
+FILE_MESSAGE = 4
+AUDIO_MESSAGE = 8
+KMARKDOWN_MESSAGE = 9
+CARD_MESSAGE = 10
+
+# 转换为事件的系统通知（extra.type）
+SYSTEM_NOTICE_TYPES = frozenset({
+    "joined_guild",
+    "exited_guild",
+    "joined_channel",
+    "exited_channel",
+    "added_reaction",
+    "deleted_reaction",
+    "private_added_reaction",
+    "private_deleted_reaction",
+    "message_btn_click",
+})
+
+# 预过滤阶段解析出的路由附在事件帧上的键名，处理阶段直接复用，无需再次查找
+ROUTE_KEY = "_route"
+
+# 解析结果缓存的上限，防止异常数据撑大缓存（正常情况下键的组合是有限的）
+_MAX_RESOLVED = 1024
+
+
+class EventRoute:
+    """一条事件路由：名称（用于白名单）与转换函数"""
+
+    __slots__ = ("name", "converter")
+
+    def __init__(self, name, converter):
+        self.name = name
+        self.converter = converter
+
+    def __repr__(self):
+        return f"EventRoute({self.name!r})"
+
+
+class EventRouter:
+    """按 (type, channel_type, extra.type) 分发事件的路由表
+
+    注册时 channel_type / extra_type 可为 None 表示任意值；查找时按
+    完全匹配 -> 任意 extra.type -> 任意 channel_type -> 两者皆任意 的顺序回退，
+    结果（包括“无路由”）按具体的键缓存，之后同类事件只需一次字典查找。
+    allowed 为允许的路由名称集合，不在其中的路由视为不存在，事件在转换前即被丢弃。
+    """
+
+    def __init__(self, allowed=None):
+        self._routes = {}  # (type, channel_type, extra_type) -> EventRoute
+        self._resolved = {}
+        self.allowed = None if allowed is None else frozenset(allowed)
+
+    def register(self, name, converter, event_type, channel_type=None, extra_type=None):
+        """注册转换函数，同一个键重复注册时后者覆盖前者"""
+        self._routes[(event_type, channel_type, extra_type)] = EventRoute(name, converter)
+        self._resolved.clear()
+
+    def set_allowed(self, allowed):
+        self.allowed = None if allowed is None else frozenset(allowed)
+        self._resolved.clear()
+
+    def route_names(self):
+        return sorted({route.name for route in self._routes.values()})
+
+    def resolve(self, d):
+        """返回事件对应的路由，没有路由或不在白名单中时返回 None"""
+        extra = d.get('extra')
+        key = (d.get('type'), d.get('channel_type'), extra.get('type') if extra else None)
+        try:
+            return self._resolved[key]
+        except KeyError:
+            pass
+        except TypeError:  # 字段不可哈希（异常数据）
+            return None
+        route = self._lookup(*key)
+        if len(self._resolved) < _MAX_RESOLVED:
+            self._resolved[key] = route
+        return route
+
+    def _lookup(self, event_type, channel_type, extra_type):
+        routes = self._routes
+        for key in (
+            (event_type, channel_type, extra_type),
+            (event_type, channel_type, None),
+            (event_type, None, extra_type),
+            (event_type, None, None),
+        ):
+            route = routes.get(key)
+            if route is not None:
+                if self.allowed is not None and route.name not in self.allowed:
+                    return None
+                return route
+        return None
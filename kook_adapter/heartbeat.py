@@ -0,0 +1,85 @@
+import asyncio
+import time
+
+
+class HeartbeatMonitor:
+    """心跳往返时间（RTT）统计与PONG等待
+
+    以单调时钟记录每次PING的往返时间，按 RFC 6298 维护平滑RTT（srtt）与偏差（rttvar），
+    srtt + 4 * rttvar 即“正常响应”的时间包络，限制在 [min_timeout, max_timeout] 之间；
+    尚无样本时使用 max_timeout。PONG到达时立即唤醒等待方。
+    PING之后收到的任何帧都说明连接仍然畅通，由 frames 计数判断。
+    """
+
+    def __init__(self, min_timeout=1.0, max_timeout=6.0):
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.srtt = None
+        self.rttvar = 0.0
+        self.last_rtt = None
+        self.frames = 0  # 当前连接收到的帧数
+        self._frames_at_ping = 0
+        self._ping_sent = 0.0
+        self._pings_outstanding = 0  # 上次PONG之后发出的PING数
+        self._pong = None
+
+    def reset(self):
+        """新连接开始时调用；已学到的RTT保留，网络条件通常不会因重连而改变"""
+        self.frames = 0
+        self._frames_at_ping = 0
+        self._pings_outstanding = 0
+        self._pong = None
+
+    def timeout(self):
+        """当前的PONG等待时间包络（秒）"""
+        if self.srtt is None:
+            return self.max_timeout
+        return min(max(self.srtt + 4 * self.rttvar, self.min_timeout), self.max_timeout)
+
+    def ping_sent(self):
+        self._ping_sent = time.monotonic()
+        self._frames_at_ping = self.frames
+        self._pings_outstanding += 1
+        if self._pong is None or self._pong.done():
+            self._pong = asyncio.get_running_loop().create_future()
+
+    def pong_received(self):
+        """记录PONG，返回本次RTT；补发过PING时无法确定对应关系，不计入样本"""
+        rtt = None
+        if self._pings_outstanding == 1:
+            rtt = time.monotonic() - self._ping_sent
+            self._sample(rtt)
+        self._pings_outstanding = 0
+        if self._pong and not self._pong.done():
+            self._pong.set_result(True)
+        return rtt
+
+    def _sample(self, rtt):
+        self.last_rtt = rtt
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt)
+            self.srtt = 0.875 * self.srtt + 0.125 * rtt
+
+    def frames_since_ping(self):
+        return self.frames - self._frames_at_ping
+
+    async def wait_pong(self, timeout):
+        """等待PONG，收到返回 True，超时返回 False"""
+        if self._pong is None:
+            return False
+        try:
+            await asyncio.wait_for(asyncio.shield(self._pong), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def stats(self):
+        return {
+            "srtt": self.srtt,
+            "rttvar": self.rttvar,
+            "last_rtt": self.last_rtt,
+            "timeout": self.timeout(),
+        }
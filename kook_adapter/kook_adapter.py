@@ -1,16 +1,40 @@
 import asyncio
 from astrbot.api.platform import Platform, AstrBotMessage, MessageMember, PlatformMetadata, MessageType, register_platform_adapter
 from astrbot.api.event import MessageChain
-from astrbot.api.message_components import Plain, Image
+from astrbot.api.message_components import Plain
 from astrbot.core.platform.astr_message_event import MessageSesion
+from astrbot.core.utils.astrbot_path import get_astrbot_data_path
 from astrbot import logger
-from .kook_client import KookClient
+from .kook_client import KookClient, ConnectionState
 from .kook_event import KookEvent
-import json
+from .event_pipeline import EventPipeline
+from .config import CONNECTION_CONFIG, ERROR_HANDLING_CONFIG, EVENT_CONFIG, LOGGING_CONFIG, MESSAGE_CONFIG, PERFORMANCE_CONFIG
+from .card_parser import CardContent, parse_card
+from .codec import RAW_FRAME_KEY
+from .kook_message import KookMessage, KookEventRecord
+from .role_cache import BotRoleCache, ROLE_EVENT_TYPES
+from .client_manager import get_client_manager
+from .webhook_server import KookWebhookServer
+from .media_cache import MediaPrefetcher
+from .event_router import (
+    EventRouter, ROUTE_KEY, SYSTEM_EVENT_TYPE, SYSTEM_NOTICE_TYPES, TEXT_MESSAGE, IMAGE_MESSAGE,
+    VIDEO_MESSAGE, FILE_MESSAGE, AUDIO_MESSAGE, KMARKDOWN_MESSAGE, CARD_MESSAGE,
+)
+from .metrics import metrics, acquire_exporter, release_exporter
+import os
 import re
+import time
+
+SYSTEM_AUTHOR_ID = "1"
 
 @register_platform_adapter("kook", "KOOK 适配器", default_config_tmpl={
-    "token": "你kook获取到的机器人token"
+    "token": "你kook获取到的机器人token",
+    "connection_mode": "websocket",  # websocket 或 webhook
+    "webhook_host": "0.0.0.0",
+    "webhook_port": 8080,
+    "webhook_path": "/kook/webhook",
+    "verify_token": "",
+    "encrypt_key": "",
 })
 class KookPlatformAdapter(Platform):
     def __init__(self, platform_config: dict, platform_settings: dict, event_queue: asyncio.Queue) -> None:
@@ -21,10 +45,34 @@ class KookPlatformAdapter(Platform):
         self._reconnect_task = None
         self.running = False
         self._main_task = None
+        self.role_cache = None
+        self.outbound = None  # 主动发送队列（send_by_session）
+        self.webhook = None  # Webhook模式下的HTTP端点
+        self.media = None  # 入站图片预取（media_prefetch_enabled）
+        # 事件路由表，其他插件可通过 router.register 接入新的事件类型
+        self.router = self._build_router()
 
     async def send_by_session(self, session: MessageSesion, message_chain: MessageChain):
+        """主动发送消息（定时提醒、其他插件的广播等）
+
+        消息进入适配器的出站队列后立即返回，由工作协程按频道保序、跨频道并发地发送。
+        """
+        if not self.outbound or not self.outbound.running:
+            logger.error("[KOOK] 适配器未运行，无法发送消息")
+            return
+        await self.outbound.submit({
+            "target_id": session.session_id,
+            "direct": session.message_type == MessageType.FRIEND_MESSAGE,
+            "chain": message_chain,
+        })
         await super().send_by_session(session, message_chain)
 
+    async def _send_outbound(self, item: dict):
+        """出站队列的工作函数"""
+        await KookEvent.send_with_client(
+            self.client, item["chain"], item["target_id"], item["direct"]
+        )
+
     def meta(self) -> PlatformMetadata:
         return PlatformMetadata(
             name="kook",
@@ -32,27 +80,86 @@ class KookPlatformAdapter(Platform):
             id=self.config.get("id")
         )
 
+    def get_metrics(self) -> dict:
+        """获取监控指标快照，以及各组件的队列与计数统计"""
+        result = {"metrics": metrics.snapshot()}
+        if self.client:
+            result.update({
+                "state": self.client.state,
+                "sequencer": self.client.sequencer.stats(),
+                "rate_limit": self.client.get_rate_limit_stats(),
+                "delivery": self.client.delivery.stats(),
+                "filtered": self.client.filtered_count,
+                "heartbeat": self.client.heartbeat.stats(),
+            })
+            if self.client.pipeline:
+                result["pipeline"] = self.client.pipeline.stats()
+        if self.outbound:
+            result["outbound"] = self.outbound.stats()
+        if self.webhook:
+            result["webhook"] = self.webhook.stats()
+        if self.media:
+            result["media"] = self.media.stats()
+        return result
+
     async def run(self):
         """主运行循环"""
         self.running = True
         logger.info("[KOOK] 启动KOOK适配器")
         
         async def on_received(data):
-            logger.debug(f"KOOK 收到数据: {data}")
+            if LOGGING_CONFIG["enable_message_logs"]:
+                logger.debug("KOOK 收到数据: %s", data)
             if 'd' in data and data['s'] == 0:
-                event_type = data['d'].get('type')
-                # 支持type=9（文本）和type=10（卡片）
-                if event_type in (9, 10):
+                route = data[ROUTE_KEY] if ROUTE_KEY in data else self.router.resolve(data['d'])
+                if route is not None:
                     try:
-                        abm = await self.convert_message(data['d'])
+                        start = metrics.clock()
+                        abm = await self.convert_message(data['d'], data.get(RAW_FRAME_KEY), route)
+                        metrics.observe_since("kook_convert_seconds", start)
+                        start = metrics.clock()
                         await self.handle_msg(abm)
+                        metrics.observe_since("kook_commit_seconds", start)
                     except Exception as e:
                         logger.error(f"[KOOK] 消息处理异常: {e}")
         
-        self.client = KookClient(self.config['token'], on_received)
+        # 默认放在AstrBot数据目录下，与进程的工作目录无关
+        data_dir = CONNECTION_CONFIG["checkpoint_dir"] or os.path.join(get_astrbot_data_path(), "kook_adapter")
+        data_prefix = os.path.join(data_dir, self.config.get('id') or 'kook')
+        self.client = KookClient(
+            self.config['token'],
+            on_received,
+            checkpoint_path=f"{data_prefix}_session.json",
+            event_filter=self._accept_event,
+            asset_cache_path=f"{data_prefix}_assets.json",
+            # 同一进程内的多个机器人共享连接池与事件处理协程
+            manager=get_client_manager() if PERFORMANCE_CONFIG["share_client_resources"] else None,
+        )
+        self.role_cache = BotRoleCache(self.client, ttl=PERFORMANCE_CONFIG["role_cache_ttl"])
+        if MESSAGE_CONFIG["media_prefetch_enabled"]:
+            self.media = MediaPrefetcher(
+                self.client,
+                f"{data_prefix}_media",
+                max_bytes=MESSAGE_CONFIG["media_cache_max_bytes"],
+                concurrency=MESSAGE_CONFIG["media_prefetch_concurrency"],
+                max_file_size=MESSAGE_CONFIG["media_max_file_size"],
+            )
+        self.outbound = EventPipeline(
+            self._send_outbound,
+            workers=PERFORMANCE_CONFIG["outbound_workers"],
+            buffer_size=PERFORMANCE_CONFIG["outbound_queue_size"],
+            policy="block",
+            key=lambda item: item["target_id"],
+            name="出站消息",
+        )
+        self.outbound.start()
+        await acquire_exporter()
         
         # 启动主循环
-        self._main_task = asyncio.create_task(self._main_loop())
+        if self.config.get('connection_mode') == 'webhook':
+            self._main_task = asyncio.create_task(self._webhook_loop())
+        else:
+            self._main_task = asyncio.create_task(self._main_loop())
         
         try:
             await self._main_task
@@ -64,57 +171,158 @@ class KookPlatformAdapter(Platform):
             self.running = False
             await self._cleanup()
 
+    def _accept_event(self, data: dict) -> bool:
+        """事件预过滤，在构建消息对象之前丢弃不关心的事件
+
+        解析出的路由附在事件帧上（ROUTE_KEY），处理时直接使用。
+        """
+        d = data.get('d')
+        if not d:
+            return False
+        route = data[ROUTE_KEY] = self.router.resolve(d)
+        if d.get('type') == SYSTEM_EVENT_TYPE:
+            extra = d.get('extra') or {}
+            # 角色变更事件只用于使角色缓存失效
+            if extra.get('type') in ROLE_EVENT_TYPES and self.role_cache:
+                self.role_cache.invalidate(d.get('target_id'))
+            if route is None:
+                return False
+            # 机器人自己触发的系统事件
+            return (extra.get('body') or {}).get('user_id') != self.client.me_id
+        if route is None:
+            return False
+        author_id = d.get('author_id')
+        # 系统消息与机器人自己发出的消息
+        if author_id == SYSTEM_AUTHOR_ID or author_id == self.client.me_id:
+            return False
+        return True
+
     async def _main_loop(self):
-        """主循环，处理连接和重连"""
+        """主循环，处理连接和重连
+
+        连接断开由 KookClient 的状态切换直接唤醒，无需轮询。
+        连接成功后未能保持 min_stable_connection 秒即断开的同样计为失败并退避，
+        避免握手后立即被关闭时陷入无间隔的重连循环。
+        非致命的失败（网络中断、网关不可用等）一直按退避延迟重试，
+        只有 KookClient 进入 FATAL（如Token无效）时才停止。
+        """
         consecutive_failures = 0
-        max_consecutive_failures = 5
+        min_stable = CONNECTION_CONFIG["min_stable_connection"]
+        disconnected_at = None  # 断线时刻，用于统计重连耗时
         
         while self.running:
             try:
-                logger.info("[KOOK] 尝试连接KOOK服务器...")
+                # 优先尝试恢复会话，避免丢失断线期间的事件
+                resume = self.client.can_resume()
+                if resume:
+                    logger.info(f"[KOOK] 尝试恢复会话，sn: {self.client.last_sn}")
+                else:
+                    logger.info("[KOOK] 尝试连接KOOK服务器...")
                 
                 # 尝试连接
-                success = await self.client.connect()
+                success = await self.client.connect(resume=resume)
                 
                 if success:
                     logger.info("[KOOK] 连接成功，开始监听消息")
-                    consecutive_failures = 0  # 重置失败计数
+                    connected_at = time.monotonic()
+                    if disconnected_at is not None:
+                        metrics.inc("kook_reconnects_total")
+                        metrics.observe("kook_reconnect_seconds", time.monotonic() - disconnected_at)
+                        disconnected_at = None
                     
                     # 等待连接结束（可能是正常关闭或异常）
-                    while self.client.running and self.running:
-                        await asyncio.sleep(1)
+                    state = await self.client.wait_for_state(
+                        ConnectionState.DISCONNECTED, ConnectionState.FATAL
+                    )
+                    if state == ConnectionState.FATAL:
+                        logger.error("[KOOK] 连接出现不可恢复的错误，停止重连")
+                        break
                         
-                    if self.running:
+                    if not self.running:
+                        break
+                    disconnected_at = time.monotonic()
+                    if disconnected_at - connected_at >= min_stable:
+                        consecutive_failures = 0  # 连接已稳定，重置失败计数
                         logger.warning("[KOOK] 连接断开，准备重连")
-                        
+                        continue
+                    
+                    consecutive_failures += 1
+                    metrics.inc("kook_connect_failures_total")
+                    wait_time = self._backoff_delay(consecutive_failures)
+                    logger.warning(f"[KOOK] 连接建立后很快断开，等待 {wait_time} 秒后重连...")
+                    await asyncio.sleep(wait_time)
+                    
                 else:
+                    if self.client.state == ConnectionState.FATAL:
+                        logger.error("[KOOK] 连接出现不可恢复的错误，停止重连")
+                        break
+                    
                     consecutive_failures += 1
+                    metrics.inc("kook_connect_failures_total")
                     logger.error(f"[KOOK] 连接失败，连续失败次数: {consecutive_failures}")
                     
-                    if consecutive_failures >= max_consecutive_failures:
-                        logger.error("[KOOK] 连续失败次数过多，停止重连")
-                        break
+                    # 网关暂时不可用时保留会话，下次仍尝试恢复；
+                    # 服务端明确拒绝恢复时由 KookClient 清空会话
                     
                     # 等待一段时间后重试
-                    wait_time = min(2 ** consecutive_failures, 60)  # 指数退避，最大60秒
+                    wait_time = self._backoff_delay(consecutive_failures)
                     logger.info(f"[KOOK] 等待 {wait_time} 秒后重试...")
                     await asyncio.sleep(wait_time)
                     
             except Exception as e:
                 consecutive_failures += 1
                 logger.error(f"[KOOK] 主循环异常: {e}")
-                
-                if consecutive_failures >= max_consecutive_failures:
-                    logger.error("[KOOK] 连续异常次数过多，停止重连")
-                    break
-                
-                await asyncio.sleep(5)
+                await asyncio.sleep(self._backoff_delay(consecutive_failures))
+
+    async def _webhook_loop(self):
+        """Webhook模式：启动HTTP端点，事件由KOOK推送，无需维护长连接"""
+        self.webhook = KookWebhookServer(
+            self.client,
+            host=self.config.get('webhook_host', '0.0.0.0'),
+            port=int(self.config.get('webhook_port', 8080)),
+            path=self.config.get('webhook_path', '/kook/webhook'),
+            verify_token=self.config.get('verify_token', ''),
+            encrypt_key=self.config.get('encrypt_key', ''),
+        )
+        await self.client.start_webhook()
+        await self.webhook.start()
+        logger.info("[KOOK] Webhook模式已启动，等待KOOK推送事件")
+        while self.running:
+            await asyncio.sleep(3600)
+
+    @staticmethod
+    def _backoff_delay(failures):
+        """指数退避延迟，由 CONNECTION_CONFIG 控制初始值与上限"""
+        # 限制指数，持续失败时避免数值溢出
+        delay = CONNECTION_CONFIG["initial_reconnect_delay"] * 2 ** min(failures - 1, 16)
+        return min(delay, CONNECTION_CONFIG["max_reconnect_delay"])
 
     async def _cleanup(self):
         """清理资源"""
         logger.info("[KOOK] 开始清理资源")
+        await release_exporter()
+
+        if self.webhook:
+            try:
+                await self.webhook.stop()
+            except Exception as e:
+                logger.error(f"[KOOK] 停止Webhook服务异常: {e}")
+
+        if self.outbound:
+            # 先发送出站队列中剩余的消息
+            if not await self.outbound.drain(ERROR_HANDLING_CONFIG["drain_timeout"]):
+                logger.warning("[KOOK] 出站队列未能在超时前发送完毕")
+            await self.outbound.stop()
+
+        if self.media:
+            await self.media.close()
         
         if self.client:
+            # 先等待待重试的消息发送完毕
+            try:
+                await self.client.delivery.drain(ERROR_HANDLING_CONFIG["drain_timeout"])
+            except Exception as e:
+                logger.error(f"[KOOK] 等待消息重试异常: {e}")
             try:
                 await self.client.close()
             except Exception as e:
@@ -129,53 +337,110 @@ class KookPlatformAdapter(Platform):
         
         logger.info("[KOOK] 资源清理完成")
 
-    async def convert_message(self, data: dict) -> AstrBotMessage:
-        abm = AstrBotMessage()
-        abm.type = MessageType.GROUP_MESSAGE if data.get('channel_type') == 'GROUP' else MessageType.FRIEND_MESSAGE
-        abm.group_id = data.get('target_id')
-        abm.sender = MessageMember(user_id=data.get('author_id'), nickname=data.get('extra', {}).get('author', {}).get('username', ''))
-        abm.raw_message = data
-        abm.self_id = data.get('author_id')
-        abm.session_id = data.get('target_id')
-        abm.message_id = data.get('msg_id')
-
-        # 普通文本消息
-        if data.get('type') == 9:
-            raw_content = data.get('extra', {}).get('kmarkdown', {}).get('raw_content', data.get('content'))
-            
-            raw_content = re.sub(r'^@[^\s]+(\s*-\s*[^\s]+)?\s*', '', raw_content)# 删除@前缀
-            abm.message_str = raw_content
-            abm.message = [Plain(text=raw_content)]
-        # 卡片消息
-        elif data.get('type') == 10:
-            content = data.get('content')
-            try:
-                card_list = json.loads(content)
-                text = ""
-                images = []
-                for card in card_list:
-                    for module in card.get('modules', []):
-                        if module.get('type') == 'section':
-                            text += module.get('text', {}).get('content', '')
-                        elif module.get('type') == 'container':
-                            for element in module.get('elements', []):
-                                if element.get('type') == 'image':
-                                    images.append(element.get('src'))
-                abm.message_str = text
-                abm.message = []
-                if text:
-                    abm.message.append(Plain(text=text))
-                for img_url in images:
-                    abm.message.append(Image(file=img_url))
-            except Exception as e:
-                abm.message_str = '[卡片消息解析失败]'
-                abm.message = [Plain(text='[卡片消息解析失败]')]
-        else:
+    def _build_router(self) -> EventRouter:
+        router = EventRouter(EVENT_CONFIG["allowed_events"])
+        router.register("text", self._convert_text, TEXT_MESSAGE)
+        router.register("kmarkdown", self._convert_kmarkdown, KMARKDOWN_MESSAGE)
+        router.register("card", self._convert_card, CARD_MESSAGE)
+        router.register("image", self._convert_image, IMAGE_MESSAGE)
+        router.register("video", self._convert_video, VIDEO_MESSAGE)
+        router.register("file", self._convert_file, FILE_MESSAGE)
+        router.register("audio", self._convert_audio, AUDIO_MESSAGE)
+        for extra_type in SYSTEM_NOTICE_TYPES:
+            router.register("system", self._convert_system, SYSTEM_EVENT_TYPE, extra_type=extra_type)
+        return router
+
+    async def convert_message(self, data: dict, raw_frame: bytes = None, route=None) -> AstrBotMessage:
+        abm = KookMessage()
+        record = KookEventRecord(data, raw_frame)
+        is_group = record.channel_type == 'GROUP'
+        abm.type = MessageType.GROUP_MESSAGE if is_group else MessageType.FRIEND_MESSAGE
+        abm.group_id = record.target_id if is_group else ""
+        abm.sender = MessageMember(user_id=record.author_id, nickname=record.author_name)
+        abm.raw_message = record
+        abm.self_id = self.client.me_id if self.client else None
+        # 私聊的 target_id 是机器人自己，会话应指向对方用户
+        abm.session_id = record.target_id if is_group else record.author_id
+        abm.message_id = record.msg_id
+
+        route = route or self.router.resolve(data)
+        if route is None:
             abm.message_str = '[不支持的消息类型]'
             abm.message = [Plain(text='[不支持的消息类型]')]
-
+        else:
+            await route.converter(abm, data, record)
         return abm
 
+    async def _set_content(self, abm: KookMessage, content: CardContent):
+        """设置消息文本与组件
+
+        启用预取时在后台开始下载图片，不阻塞事件处理协程；
+        下游需要图片文件时再等待下载完成（见 PrefetchedImage）。
+        """
+        abm.message_str = content.text
+        media = self.media
+        image_urls = content.image_urls() if media else None
+        if image_urls:
+            media.start(image_urls)
+            abm.set_message_factory(lambda: content.to_components(media))
+        else:
+            abm.set_message_factory(content.to_components)
+
+    @staticmethod
+    def _attachment(data: dict):
+        """媒体消息的 (URL, 文件名)"""
+        attachment = (data.get('extra') or {}).get('attachments') or {}
+        url = attachment.get('url') or data.get('content') or ''
+        return url, attachment.get('name') or url.rsplit('/', 1)[-1]
+
+    async def _convert_text(self, abm: KookMessage, data: dict, record: KookEventRecord):
+        text = re.sub(r'^(\(met\)[^()]*\(met\)\s*)+', '', data.get('content') or '')  # 删除@前缀
+        abm.message_str = text
+        abm.set_message_factory(lambda: [Plain(text=text)])
+
+    async def _convert_kmarkdown(self, abm: KookMessage, data: dict, record: KookEventRecord):
+        raw_content = data.get('extra', {}).get('kmarkdown', {}).get('raw_content', data.get('content'))
+        
+        raw_content = re.sub(r'^@[^\s]+(\s*-\s*[^\s]+)?\s*', '', raw_content)# 删除@前缀
+        abm.message_str = raw_content
+        abm.set_message_factory(lambda: [Plain(text=raw_content)])
+
+    async def _convert_card(self, abm: KookMessage, data: dict, record: KookEventRecord):
+        try:
+            card = parse_card(data.get('content') or '')
+        except Exception:
+            abm.message_str = '[卡片消息解析失败]'
+            abm.message = [Plain(text='[卡片消息解析失败]')]
+            return
+        await self._set_content(abm, card)
+
+    async def _convert_image(self, abm: KookMessage, data: dict, record: KookEventRecord):
+        url, _ = self._attachment(data)
+        await self._set_content(abm, CardContent("", [("image", url)]))
+
+    async def _convert_video(self, abm: KookMessage, data: dict, record: KookEventRecord):
+        url, _ = self._attachment(data)
+        await self._set_content(abm, CardContent("", [("video", url)]))
+
+    async def _convert_file(self, abm: KookMessage, data: dict, record: KookEventRecord):
+        url, name = self._attachment(data)
+        await self._set_content(abm, CardContent("", [("file", (name, url))]))
+
+    async def _convert_audio(self, abm: KookMessage, data: dict, record: KookEventRecord):
+        url, _ = self._attachment(data)
+        await self._set_content(abm, CardContent("", [("audio", url)]))
+
+    async def _convert_system(self, abm: KookMessage, data: dict, record: KookEventRecord):
+        """系统通知（加入/退出、表情回应、按钮点击等），事件内容见 raw_message"""
+        body = (data.get('extra') or {}).get('body') or {}
+        user_id = body.get('user_id') or ''
+        abm.type = MessageType.OTHER_MESSAGE
+        abm.sender = MessageMember(user_id=user_id, nickname=(body.get('user_info') or {}).get('username', ''))
+        if record.channel_type != 'GROUP':
+            abm.session_id = user_id
+        abm.message_str = ''
+        abm.message = []
+
     async def handle_msg(self, message: AstrBotMessage):
         message_event = KookEvent(
             message_str=message.message_str,
@@ -184,18 +449,19 @@ class KookPlatformAdapter(Platform):
             session_id=message.session_id,
             client=self.client
         )
-        raw = message.raw_message
-        is_at = False
-        # 检查kmarkdown.mention_role_part
-        kmarkdown = raw.get('extra', {}).get('kmarkdown', {})
-        mention_role_part = kmarkdown.get('mention_role_part', [])
-        raw_content = kmarkdown.get('raw_content', '')
-        bot_nickname = "astrbot"  
-        if mention_role_part:
-            is_at = True
-        elif f"@{bot_nickname}" in raw_content:
-            is_at = True
-        if is_at:
+        if await self._is_mentioned(message.raw_message):
             message_event.is_wake = True
             message_event.is_at_or_wake_command = True
-        self.commit_event(message_event) 
+        self.commit_event(message_event)
+
+    async def _is_mentioned(self, record: KookEventRecord) -> bool:
+        """判断消息是否@了机器人：@机器人本身、@机器人拥有的角色或@全体成员"""
+        if record.mention_all:
+            return True
+        me_id = self.client.me_id
+        if me_id and me_id in record.mention:
+            return True
+        if record.mention_roles and record.guild_id and self.role_cache:
+            bot_roles = await self.role_cache.get(record.guild_id)
+            return any(role in bot_roles for role in record.mention_roles)
+        return False 
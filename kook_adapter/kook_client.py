@@ -1,111 +1,506 @@
 import asyncio
 import websockets
-import json
 import logging
 import aiohttp
-import zlib
-import time
 import random
+import time
+from urllib.parse import urlencode
+from .config import CONNECTION_CONFIG, ERROR_HANDLING_CONFIG, LOGGING_CONFIG, MESSAGE_CONFIG, PERFORMANCE_CONFIG, SECURITY_CONFIG
+from .rate_limiter import RateLimiter
+from .event_pipeline import EventPipeline
+from .checkpoint import SessionCheckpoint
+from .sequencer import EventSequencer
+from .codec import FrameDecoder, RAW_FRAME_KEY, json_dumps
+from .asset_uploader import AssetUploader
+from .delivery import OutboundDelivery
+from .metrics import metrics
+from .heartbeat import HeartbeatMonitor
+
+API_BASE = "https://www.kookapp.cn/api/v3"
+
+# HELLO握手中无法通过重连恢复的错误码
+FATAL_HELLO_CODES = (40100, 40101, 40102)
+TOKEN_EXPIRED_CODE = 40103
+# 恢复会话失败（缺少参数、会话过期、sn无效），需要冷启动
+RESUME_FAILED_CODES = (40106, 40107, 40108)
+HTTP_CHUNK_SIZE = 64 * 1024
+
+
+class KookMessageType:
+    """KOOK消息类型"""
+    TEXT = 1
+    IMAGE = 2
+    KMARKDOWN = 9
+    CARD = 10
+
+
+MESSAGE_TYPE_NAMES = {
+    KookMessageType.TEXT: "文本",
+    KookMessageType.IMAGE: "图片",
+    KookMessageType.KMARKDOWN: "KMarkdown",
+    KookMessageType.CARD: "卡片",
+}
+
+
+class ConnectionState:
+    """连接状态"""
+    DISCONNECTED = "disconnected"
+    CONNECTING = "connecting"
+    CONNECTED = "connected"
+    RESUMED = "resumed"
+    FATAL = "fatal"  # 不可恢复的错误（如Token无效），不应再重连
+
+
+def create_http_session():
+    """创建带连接池的HTTP会话（长连接复用、DNS缓存、并发上限）"""
+    limit = PERFORMANCE_CONFIG["max_concurrent_requests"]
+    if PERFORMANCE_CONFIG["enable_connection_pooling"]:
+        pooling = {"keepalive_timeout": PERFORMANCE_CONFIG["keepalive_timeout"]}
+    else:
+        # aiohttp 不允许 force_close 与 keepalive_timeout 同时设置
+        pooling = {"force_close": True}
+    connector = aiohttp.TCPConnector(
+        limit=limit,
+        limit_per_host=limit,
+        ttl_dns_cache=PERFORMANCE_CONFIG["dns_cache_ttl"],
+        ssl=None if SECURITY_CONFIG["verify_ssl"] else False,
+        **pooling,
+    )
+    return aiohttp.ClientSession(
+        connector=connector,
+        timeout=aiohttp.ClientTimeout(total=PERFORMANCE_CONFIG["request_timeout"]),
+    )
+
 
 class KookClient:
-    def __init__(self, token, event_callback):
+    def __init__(self, token, event_callback, checkpoint_path=None, event_filter=None, asset_cache_path=None, manager=None):
         self.token = token
         self.event_callback = event_callback  # 回调函数，用于处理接收到的事件
+        self.manager = manager  # 多机器人共享资源的管理器（KookClientManager），可为空
+        self.event_filter = event_filter  # 事件预过滤函数，返回False的事件在进入处理流水线前丢弃
+        self.filtered_count = 0
+        self.decoder = FrameDecoder()
+        self.me = None  # 机器人自身的用户信息（user/me）
         self.ws = None
         self.running = False
         self.session_id = None
         self.last_sn = 0  # 记录最后处理的消息序号
+        self._inflight_sns = set()  # 已交给流水线但尚未处理完的事件sn，检查点不能越过它们
         self.heartbeat_task = None
-        self.reconnect_delay = 1  # 重连延迟，指数退避
-        self.max_reconnect_delay = 60  # 最大重连延迟
-        self.heartbeat_interval = 30  # 心跳间隔
-        self.heartbeat_timeout = 6  # 心跳超时时间
-        self.last_heartbeat_time = 0
+        self.reconnect_delay = CONNECTION_CONFIG["initial_reconnect_delay"]  # 重连延迟，指数退避
+        self.max_reconnect_delay = CONNECTION_CONFIG["max_reconnect_delay"]  # 最大重连延迟
+        self.heartbeat_interval = CONNECTION_CONFIG["heartbeat_interval"]  # 心跳间隔
+        self.heartbeat_timeout = CONNECTION_CONFIG["heartbeat_timeout"]  # 心跳超时时间
         self.heartbeat_failed_count = 0
-        self.max_heartbeat_failures = 3  # 最大心跳失败次数
-
-    async def get_gateway_url(self, resume=False, sn=0, session_id=None):
-        """获取网关连接地址"""
-        url = "https://www.kookapp.cn/api/v3/gateway/index"
-        headers = {
-            "Authorization": f"Bot {self.token}"
-        }
+        # 心跳RTT统计，PONG等待时间按实测RTT自适应
+        self.heartbeat = HeartbeatMonitor(
+            min_timeout=CONNECTION_CONFIG["heartbeat_min_timeout"],
+            max_timeout=self.heartbeat_timeout,
+        )
+        self.max_heartbeat_failures = CONNECTION_CONFIG["max_heartbeat_failures"]  # 最大心跳失败次数
+        self.state = ConnectionState.DISCONNECTED
+        self._state_changed = asyncio.Event()
+        self._listen_task = None
+        self._http_session = None  # 共享的HTTP会话，复用连接池
+        self._resuming = False  # 当前连接是否为RESUME
+        self._checkpoint_task = None
+        self._gateway_url = None  # 预取的网关地址（不含恢复参数）
+        self._gateway_fetched_at = 0.0
+        self._gateway_task = None  # 后台刷新网关地址
         
-        # 构建连接参数
-        params = {}
-        if resume:
-            params['resume'] = 1
-            params['sn'] = sn
-            if session_id:
-                params['session_id'] = session_id
+        # 会话检查点，进程重启后可在恢复窗口内直接RESUME
+        self.checkpoint = None
+        if checkpoint_path:
+            self.checkpoint = SessionCheckpoint(
+                checkpoint_path, resume_window=CONNECTION_CONFIG["resume_window"]
+            )
+            self.session_id, self.last_sn = self.checkpoint.load()
+            if self.session_id:
+                logging.info(f"[KOOK] 读取到会话检查点，session_id: {self.session_id}, sn: {self.last_sn}")
         
-        async with aiohttp.ClientSession() as session:
+        # sn重排与msg_id去重，保证事件按序且只投递一次
+        self.sequencer = EventSequencer(
+            window=PERFORMANCE_CONFIG["reorder_window"],
+            gap_timeout=PERFORMANCE_CONFIG["reorder_gap_timeout"],
+            dedup_size=PERFORMANCE_CONFIG["dedup_cache_size"],
+            dedup_ttl=PERFORMANCE_CONFIG["dedup_ttl"],
+            last_sn=self.last_sn,
+        )
+        self._gap_task = None
+        self.rate_limiter = RateLimiter(
+            enabled=SECURITY_CONFIG["enable_rate_limiting"],
+            default_limit=SECURITY_CONFIG["rate_limit_requests"],
+            default_window=SECURITY_CONFIG["rate_limit_window"],
+        )
+        # 事件处理流水线，避免慢速处理阻塞WebSocket接收
+        self.pipeline = None
+        if PERFORMANCE_CONFIG["enable_message_buffering"] and manager:
+            self.pipeline = manager.pipeline_for(self)
+        elif PERFORMANCE_CONFIG["enable_message_buffering"]:
+            self.pipeline = EventPipeline(
+                self._process_event,
+                workers=PERFORMANCE_CONFIG["event_workers"],
+                buffer_size=PERFORMANCE_CONFIG["buffer_size"],
+                policy=PERFORMANCE_CONFIG["queue_full_policy"],
+                on_drop=self._event_dropped,
+            )
+        # 出站消息投递，失败时分类重试
+        self.delivery = OutboundDelivery(
+            self,
+            max_attempts=ERROR_HANDLING_CONFIG["max_retry_attempts"],
+            delay_base=ERROR_HANDLING_CONFIG["retry_delay_base"],
+            delay_max=ERROR_HANDLING_CONFIG["retry_delay_max"],
+            retry_on_network_error=ERROR_HANDLING_CONFIG["retry_on_network_error"],
+            queue_size=ERROR_HANDLING_CONFIG["retry_queue_size"],
+        )
+        # 图片上传与内容哈希缓存
+        self.assets = AssetUploader(
+            self,
+            cache_path=asset_cache_path,
+            max_entries=MESSAGE_CONFIG["asset_cache_max_entries"],
+            max_age=MESSAGE_CONFIG["asset_cache_max_age"],
+        )
+
+    def _get_http_session(self):
+        """获取共享的HTTP会话，不存在或已关闭时创建"""
+        if self.manager:
+            return self.manager.get_http_session()
+        if self._http_session is None or self._http_session.closed:
+            self._http_session = create_http_session()
+        return self._http_session
+
+    async def _close_http_session(self):
+        """关闭共享的HTTP会话"""
+        if self._http_session and not self._http_session.closed:
             try:
-                async with session.get(url, headers=headers, params=params) as resp:
-                    if resp.status != 200:
-                        logging.error(f"[KOOK] 获取gateway失败，状态码: {resp.status}")
-                        return None
-                    
-                    data = await resp.json()
-                    if data.get('code') != 0:
-                        logging.error(f"[KOOK] 获取gateway失败: {data}")
-                        return None
-                    
-                    gateway_url = data["data"]["url"]
-                    logging.info(f"[KOOK] 获取gateway成功: {gateway_url}")
-                    return gateway_url
+                await self._http_session.close()
             except Exception as e:
-                logging.error(f"[KOOK] 获取gateway异常: {e}")
-                return None
+                logging.error(f"[KOOK] 关闭HTTP会话异常: {e}")
+        self._http_session = None
 
-    async def connect(self, resume=False):
-        """连接WebSocket"""
+    async def _request(self, method, route, **kwargs):
+        """经速率限制调度器发送REST请求，返回 (HTTP状态码, JSON数据)
+
+        收到429时按服务端给出的重置时间排队重发，而不是直接失败。
+        请求体无法重复使用时（如上传文件），可传入 data_factory 在每次发送前生成。
+        """
+        data_factory = kwargs.pop("data_factory", None)
+        url = f"{API_BASE}/{route}"
+        headers = {"Authorization": f"Bot {self.token}"}
+        session = self._get_http_session()
+        max_retries = SECURITY_CONFIG["max_rate_limit_retries"]
+        for attempt in range(max_retries + 1):
+            await self.rate_limiter.acquire(route)
+            if data_factory:
+                kwargs["data"] = data_factory()
+            async with session.request(method, url, headers=headers, **kwargs) as resp:
+                self.rate_limiter.update(route, resp.headers, resp.status)
+                if resp.status == 429 and attempt < max_retries:
+                    continue
+                if resp.status != 200:
+                    return resp.status, None
+                return resp.status, await resp.json(content_type=None)
+        return 429, None
+
+    def get_rate_limit_stats(self):
+        """获取速率限制各桶的排队深度与等待时间"""
+        return self.rate_limiter.stats()
+
+    async def get_me(self):
+        """获取机器人自身的用户信息，成功后缓存"""
+        if self.me is not None:
+            return self.me
         try:
-            # 获取gateway地址
-            gateway_url = await self.get_gateway_url(
-                resume=resume, 
-                sn=self.last_sn, 
-                session_id=self.session_id
+            status, data = await self._request("GET", "user/me")
+            if status == 200 and data.get('code') == 0:
+                self.me = data.get('data') or {}
+                logging.info(f"[KOOK] 机器人ID: {self.me.get('id')}")
+            else:
+                logging.error(f"[KOOK] 获取机器人信息失败: {status} {data}")
+        except Exception as e:
+            logging.error(f"[KOOK] 获取机器人信息异常: {e}")
+        return self.me
+
+    async def get_guild_user(self, guild_id, user_id):
+        """获取用户在服务器中的信息（包含角色列表），失败返回 None"""
+        try:
+            status, data = await self._request(
+                "GET", "user/view", params={"user_id": user_id, "guild_id": guild_id}
             )
+            if status == 200 and data.get('code') == 0:
+                return data.get('data') or {}
+            logging.error(f"[KOOK] 获取服务器用户信息失败: {status} {data}")
+        except Exception as e:
+            logging.error(f"[KOOK] 获取服务器用户信息异常: {e}")
+        return None
+
+    @property
+    def me_id(self):
+        return self.me.get('id') if self.me else None
+
+    async def get_gateway_url(self, resume=False, sn=0, session_id=None):
+        """获取网关连接地址（优先使用预取的地址），resume 时附加恢复会话的参数"""
+        base, _ = await self._gateway_base()
+        return self._build_gateway_url(base, resume, sn, session_id) if base else None
+
+    @staticmethod
+    def _build_gateway_url(base, resume=False, sn=0, session_id=None):
+        if not resume:
+            return base
+        params = {'resume': 1, 'sn': sn}
+        if session_id:
+            params['session_id'] = session_id
+        return f"{base}{'&' if '?' in base else '?'}{urlencode(params)}"
+
+    async def _gateway_base(self, fresh=False):
+        """返回 (网关地址, 是否来自缓存)
+
+        缓存未过期时直接使用，无需请求；请求失败时退回仍缓存着的旧地址。
+        """
+        ttl = CONNECTION_CONFIG["gateway_url_ttl"]
+        if not fresh and self._gateway_url and time.monotonic() - self._gateway_fetched_at < ttl:
+            metrics.inc("kook_gateway_url_total", result="cached")
+            return self._gateway_url, True
+        stale = None if fresh else self._gateway_url
+        url = await self._fetch_gateway_url()
+        if url:
+            metrics.inc("kook_gateway_url_total", result="fetched")
+            return url, False
+        if stale:
+            metrics.inc("kook_gateway_url_total", result="stale")
+            logging.warning("[KOOK] 获取gateway失败，使用缓存的网关地址")
+            return stale, True
+        return None, False
+
+    async def _fetch_gateway_url(self):
+        """请求 gateway/index，成功后缓存网关地址"""
+        try:
+            status, data = await self._request("GET", "gateway/index")
+            if status == 401:
+                # Token无效，重试没有意义，由上层停止重连
+                logging.error("[KOOK] 获取gateway失败：Token无效")
+                self._set_state(ConnectionState.FATAL)
+                return None
+            if status != 200:
+                logging.error(f"[KOOK] 获取gateway失败，状态码: {status}")
+                return None
             
-            if not gateway_url:
-                return False
+            if data.get('code') != 0:
+                logging.error(f"[KOOK] 获取gateway失败: {data}")
+                return None
             
-            # 连接WebSocket
-            self.ws = await websockets.connect(gateway_url)
-            self.running = True
-            logging.info('[KOOK] WebSocket 连接成功')
+            gateway_url = data["data"]["url"]
+            if gateway_url != self._gateway_url:
+                logging.info(f"[KOOK] 获取gateway成功: {gateway_url}")
+            self._gateway_url = gateway_url
+            self._gateway_fetched_at = time.monotonic()
+            return gateway_url
+        except Exception as e:
+            logging.error(f"[KOOK] 获取gateway异常: {e}")
+            return None
+
+    async def _gateway_refresh_loop(self):
+        """后台定期刷新网关地址
+
+        断线时可直接用缓存的地址重连，省去一次请求；刷新间隔小于HTTP长连接的保活时间，
+        到API服务器的连接（含TLS握手）也一直处于可复用状态。
+        """
+        interval = CONNECTION_CONFIG["gateway_refresh_interval"]
+        while True:
+            try:
+                await asyncio.sleep(interval)
+                await self._fetch_gateway_url()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logging.error(f"[KOOK] 刷新网关地址异常: {e}")
+
+    def _set_state(self, state):
+        """切换连接状态并唤醒所有等待者"""
+        if self.state == state:
+            return
+        logging.debug(f"[KOOK] 连接状态: {self.state} -> {state}")
+        self.state = state
+        self._state_changed.set()
+        self._state_changed = asyncio.Event()
+
+    async def wait_for_state(self, *states, timeout=None):
+        """等待连接进入指定状态之一，返回当前状态"""
+        async def _wait():
+            while self.state not in states:
+                await self._state_changed.wait()
+            return self.state
+        return await asyncio.wait_for(_wait(), timeout=timeout)
+
+    async def connect(self, resume=False):
+        """连接WebSocket，握手完成后返回，消息监听在后台任务中进行
+
+        返回是否连接成功，之后可通过 wait_for_state 等待断开。
+        """
+        self._set_state(ConnectionState.CONNECTING)
+        try:
+            if self.manager:
+                # 多机器人时错开建连时间
+                self.manager.register(self)
+                await self.manager.stagger_connect(self)
+            
+            # 创建共享HTTP会话
+            self._get_http_session()
             
-            # 启动心跳任务
-            if self.heartbeat_task:
-                self.heartbeat_task.cancel()
-            self.heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+            # 获取机器人自身信息（用于过滤自己发出的消息）与网关地址，两者互不依赖，并发进行；
+            # 网关地址通常已预取，无需请求
+            if self.me is None:
+                _, gateway = await asyncio.gather(self.get_me(), self._gateway_base())
+            else:
+                gateway = await self._gateway_base()
             
-            # 开始监听消息
-            await self.listen()
-            return True
+            # 使用缓存的地址连接或握手失败时，立即重新获取地址重试一次
+            for attempt in range(2):
+                gateway_url, cached = gateway
+                if not gateway_url:
+                    if self.state != ConnectionState.FATAL:
+                        self._set_state(ConnectionState.DISCONNECTED)
+                    return False
+                try:
+                    state = await self._open_session(gateway_url, resume)
+                except (OSError, websockets.exceptions.WebSocketException) as e:
+                    if not cached or attempt:
+                        raise
+                    logging.warning(f"[KOOK] 使用缓存的网关地址连接失败，重新获取: {e}")
+                    await self._abort_connection()
+                else:
+                    if state == ConnectionState.CONNECTED:
+                        if not self._gateway_task:
+                            self._gateway_task = asyncio.create_task(self._gateway_refresh_loop())
+                        return True
+                    if state == ConnectionState.FATAL or not cached or attempt:
+                        return False
+                    logging.warning("[KOOK] 使用缓存的网关地址握手失败，重新获取后重试")
+                self._set_state(ConnectionState.CONNECTING)
+                gateway = await self._gateway_base(fresh=True)
+            return False
             
+        except asyncio.TimeoutError:
+            logging.error('[KOOK] 等待握手超时')
+            await self._abort_connection()
+            return False
         except Exception as e:
             logging.error(f'[KOOK] WebSocket 连接失败: {e}')
+            await self._abort_connection()
             return False
 
+    async def _open_session(self, gateway_url, resume):
+        """连接网关WebSocket并等待HELLO握手，返回握手后的连接状态"""
+        self.ws = await websockets.connect(
+            self._build_gateway_url(gateway_url, resume, self.last_sn, self.session_id),
+            open_timeout=CONNECTION_CONFIG["connection_timeout"],
+            max_size=CONNECTION_CONFIG["max_message_size"],
+        )
+        self.running = True
+        self._resuming = bool(resume and self.session_id)
+        if not self._resuming:
+            # 新会话的sn从头计数
+            self.last_sn = 0
+            self.sequencer.reset()
+            self._inflight_sns.clear()
+        self.decoder.reset()
+        logging.info('[KOOK] WebSocket 连接成功')
+        
+        # 启动事件处理流水线
+        if self.pipeline:
+            self.pipeline.start()
+        
+        # 启动心跳任务，失败计数只针对当前连接
+        self.heartbeat_failed_count = 0
+        self.heartbeat.reset()
+        if self.heartbeat_task:
+            self.heartbeat_task.cancel()
+        self.heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+        
+        # 启动检查点写盘任务
+        if self.checkpoint and not self._checkpoint_task:
+            self._checkpoint_task = asyncio.create_task(self._checkpoint_loop())
+        
+        # 开始监听消息，并等待HELLO握手结果
+        self._listen_task = asyncio.create_task(self.listen())
+        return await self.wait_for_state(
+            ConnectionState.CONNECTED,
+            ConnectionState.DISCONNECTED,
+            ConnectionState.FATAL,
+            timeout=CONNECTION_CONFIG["connection_timeout"],
+        )
+
+    async def start_webhook(self):
+        """以Webhook模式启动：不连接网关，事件由 feed_event 送入"""
+        if self.manager:
+            self.manager.register(self)
+        self._get_http_session()
+        if self.me is None:
+            await self.get_me()
+        if self.pipeline:
+            self.pipeline.start()
+        self._set_state(ConnectionState.CONNECTED)
+
+    async def feed_event(self, data):
+        """投递来自外部（Webhook）的事件
+
+        多个副本各自只收到部分事件，sn不连续，因此只按 msg_id 去重，不做sn重排。
+        """
+        if self.sequencer.accept(data):
+            await self._dispatch_event(data)
+
+    async def _abort_connection(self):
+        """连接失败时清理半开的连接"""
+        self.running = False
+        if self._listen_task and not self._listen_task.done():
+            self._listen_task.cancel()
+            try:
+                await self._listen_task
+            except asyncio.CancelledError:
+                pass
+        if self.ws:
+            try:
+                await self.ws.close()
+            except Exception:
+                pass
+        if self.state != ConnectionState.FATAL:
+            self._set_state(ConnectionState.DISCONNECTED)
+
+    async def _disconnect(self):
+        """主动断开当前连接（如心跳失败），使监听循环立即退出"""
+        self.running = False
+        if self.ws:
+            try:
+                await self.ws.close()
+            except Exception as e:
+                logging.error(f"[KOOK] 关闭WebSocket异常: {e}")
+
     async def listen(self):
         """监听WebSocket消息"""
         try:
             while self.running:
                 try:
-                    msg = await asyncio.wait_for(self.ws.recv(), timeout=10)
+                    msg = await asyncio.wait_for(
+                        self.ws.recv(), timeout=CONNECTION_CONFIG["websocket_timeout"]
+                    )
                     
-                    if isinstance(msg, bytes):
-                        try:
-                            msg = zlib.decompress(msg)
-                        except Exception as e:
-                            logging.error(f"[KOOK] 解压消息失败: {e}")
-                            continue
-                        msg = msg.decode('utf-8')
+                    self.heartbeat.frames += 1
+                    metrics.inc("kook_frames_received_total")
+                    metrics.inc("kook_frame_bytes_total", len(msg))
+                    start = metrics.clock()
+                    try:
+                        raw, data = self.decoder.decode_with_raw(msg)
+                    except Exception as e:
+                        logging.error(f"[KOOK] 解码消息失败: {e}")
+                        self.decoder.reset()
+                        continue
+                    metrics.observe_since("kook_frame_decode_seconds", start)
+                    if data.get('s') == 0:
+                        # 保留原始报文，消息对象只提取必要字段，完整数据按需解析
+                        data[RAW_FRAME_KEY] = raw
                     
-                    logging.debug(f"[KOOK] 收到原始消息: {msg}")
-                    data = json.loads(msg)
+                    if LOGGING_CONFIG["enable_message_logs"]:
+                        logging.debug("[KOOK] 收到消息: %s", data)
                     
                     # 处理不同类型的信令
                     await self._handle_signal(data)
@@ -124,16 +519,29 @@ class KookClient:
             logging.error(f'[KOOK] WebSocket 监听异常: {e}')
         finally:
             self.running = False
+            self._save_checkpoint(force=True)
+            if self.ws:
+                try:
+                    await self.ws.close()
+                except Exception:
+                    pass
+            if self.state != ConnectionState.FATAL:
+                self._set_state(ConnectionState.DISCONNECTED)
 
     async def _handle_signal(self, data):
         """处理不同类型的信令"""
         signal_type = data.get('s')
         
         if signal_type == 0:  # 事件消息
-            # 更新消息序号
-            if 'sn' in data:
-                self.last_sn = data['sn']
-            await self.event_callback(data)
+            events = self.sequencer.push(data)
+            for event in events:
+                await self._dispatch_event(event)
+            # 更新消息序号（仅推进到已按序投递的位置）
+            self.last_sn = self.sequencer.last_sn
+            if metrics.enabled:
+                metrics.inc("kook_events_dispatched_total", len(events))
+                metrics.set("kook_sn_gap", max((data.get('sn') or 0) - self.last_sn, 0))
+            self._schedule_gap_flush()
             
         elif signal_type == 1:  # HELLO握手
             await self._handle_hello(data)
@@ -150,68 +558,176 @@ class KookClient:
         else:
             logging.debug(f"[KOOK] 未处理的信令类型: {signal_type}")
 
+    async def _dispatch_event(self, data):
+        """将事件交给处理流水线或直接回调"""
+        if self.event_filter and not self.event_filter(data):
+            self.filtered_count += 1
+            return
+        if self.pipeline:
+            sn = data.get('sn')
+            if sn is not None:
+                self._inflight_sns.add(sn)
+            await self.pipeline.submit(data)
+        else:
+            await self.event_callback(data)
+
+    async def _process_event(self, data):
+        """流水线工作协程中处理事件，处理完毕后检查点才可越过它的sn"""
+        try:
+            await self.event_callback(data)
+        finally:
+            self._inflight_sns.discard(data.get('sn'))
+
+    def _event_dropped(self, data):
+        """流水线按溢出策略丢弃的事件视为已放弃，不再阻挡检查点"""
+        self._inflight_sns.discard(data.get('sn'))
+
+    @property
+    def committed_sn(self):
+        """已处理完毕的最大连续sn，仍在流水线中排队或处理的事件不计入"""
+        if self._inflight_sns:
+            return min(min(self._inflight_sns) - 1, self.last_sn)
+        return self.last_sn
+
+    def _schedule_gap_flush(self):
+        """存在sn缺口时，安排超时后跳过缺口"""
+        if not self.sequencer.pending:
+            return
+        if self._gap_task and not self._gap_task.done():
+            return
+        self._gap_task = asyncio.create_task(self._flush_gap())
+
+    async def _flush_gap(self):
+        """等待缺失的sn，超时后投递缓冲区中的事件"""
+        try:
+            deadline = self.sequencer.gap_deadline()
+            while deadline is not None:
+                await asyncio.sleep(deadline)
+                events = self.sequencer.flush_expired()
+                if events:
+                    logging.warning(f"[KOOK] 等待缺失的sn超时，跳过至 {events[0].get('sn')}")
+                for event in events:
+                    await self._dispatch_event(event)
+                self.last_sn = self.sequencer.last_sn
+                deadline = self.sequencer.gap_deadline()
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logging.error(f"[KOOK] 处理sn缺口异常: {e}")
+
     async def _handle_hello(self, data):
         """处理HELLO握手"""
         hello_data = data.get('d', {})
         code = hello_data.get('code', 0)
         
         if code == 0:
-            self.session_id = hello_data.get('session_id')
+            session_id = hello_data.get('session_id')
+            if self._resuming and session_id != self.session_id:
+                # 服务端分配了新会话，旧会话的sn已无意义
+                logging.warning("[KOOK] 旧会话已失效，按新会话处理")
+                self.reset_session()
+            self.session_id = session_id
             logging.info(f"[KOOK] 握手成功，session_id: {self.session_id}")
             # 重置重连延迟
-            self.reconnect_delay = 1
+            self.reconnect_delay = CONNECTION_CONFIG["initial_reconnect_delay"]
+            if self._resuming:
+                await self._send_resume()
+            self._save_checkpoint(force=True)
+            self._set_state(ConnectionState.CONNECTED)
         else:
             logging.error(f"[KOOK] 握手失败，错误码: {code}")
-            if code == 40103:  # token过期
+            fatal = code in FATAL_HELLO_CODES
+            if code == TOKEN_EXPIRED_CODE:  # token过期
                 logging.error("[KOOK] Token已过期，需要重新获取")
+                fatal = not ERROR_HANDLING_CONFIG["retry_on_token_expired"]
+            if code in RESUME_FAILED_CODES:
+                logging.warning("[KOOK] 恢复会话被拒绝，下次将重新建立会话")
+                self.reset_session()
+            if fatal:
+                self._set_state(ConnectionState.FATAL)
             self.running = False
 
     async def _handle_pong(self, data):
         """处理PONG心跳响应"""
-        self.last_heartbeat_time = time.time()
+        rtt = self.heartbeat.pong_received()
         self.heartbeat_failed_count = 0
-        logging.debug("[KOOK] 收到心跳响应")
+        if rtt is not None:
+            metrics.observe("kook_heartbeat_rtt_seconds", rtt)
+        if LOGGING_CONFIG["enable_heartbeat_logs"]:
+            logging.debug("[KOOK] 收到心跳响应，RTT: %s", rtt)
 
     async def _handle_reconnect(self, data):
         """处理重连指令"""
         logging.warning("[KOOK] 收到重连指令")
         # 清空本地状态
-        self.last_sn = 0
-        self.session_id = None
+        self.reset_session()
         self.running = False
 
     async def _handle_resume_ack(self, data):
         """处理RESUME确认"""
         resume_data = data.get('d', {})
-        self.session_id = resume_data.get('session_id')
+        self.session_id = resume_data.get('session_id') or self.session_id
+        self._resuming = False
         logging.info(f"[KOOK] Resume成功，session_id: {self.session_id}")
+        self._save_checkpoint(force=True)
+        self._set_state(ConnectionState.RESUMED)
+
+    def can_resume(self):
+        """是否具备恢复会话的条件"""
+        return CONNECTION_CONFIG["enable_resume"] and bool(self.session_id)
+
+    def reset_session(self):
+        """清空会话状态与检查点，下次连接将冷启动"""
+        self.last_sn = 0
+        self.session_id = None
+        self._resuming = False
+        self.sequencer.reset()
+        self._inflight_sns.clear()
+        if self.checkpoint:
+            self.checkpoint.clear()
+
+    def _save_checkpoint(self, force=False):
+        """保存会话检查点，sn取已处理完毕的位置，进程重启后从未处理的事件开始补发"""
+        if self.checkpoint and self.session_id:
+            self.checkpoint.save(self.session_id, self.committed_sn, force=force)
+
+    async def _checkpoint_loop(self):
+        """定期将 session_id/sn 写入检查点"""
+        interval = CONNECTION_CONFIG["checkpoint_interval"]
+        while True:
+            try:
+                await asyncio.sleep(interval)
+                self._save_checkpoint()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logging.error(f"[KOOK] 保存会话检查点异常: {e}")
 
     async def _heartbeat_loop(self):
-        """心跳循环"""
+        """心跳循环
+
+        按固定节奏（30±5秒）发送PING，不额外增加流量。PONG到达即完成本轮；
+        超出RTT包络仍未收到PONG、且期间也没有收到任何帧时，立即补发PING探测（等待时间逐次翻倍），
+        连续 max_heartbeat_failures 次无响应即断开连接，由上层立即尝试恢复会话。
+        """
+        first = True
         while self.running:
             try:
                 # 随机化心跳间隔 (30±5秒)
                 interval = self.heartbeat_interval + random.randint(-5, 5)
+                if first and self.manager:
+                    # 多机器人时首次心跳按分配的相位错开，避免心跳对齐
+                    interval = max(self.manager.heartbeat_offset(self, self.heartbeat_interval), 1)
+                first = False
                 await asyncio.sleep(interval)
                 
                 if not self.running:
                     break
                 
-                # 发送心跳
-                await self._send_ping()
-                
-                # 等待PONG响应
-                await asyncio.sleep(self.heartbeat_timeout)
-                
-                # 检查是否收到PONG响应
-                if time.time() - self.last_heartbeat_time > self.heartbeat_timeout:
-                    self.heartbeat_failed_count += 1
-                    logging.warning(f"[KOOK] 心跳超时，失败次数: {self.heartbeat_failed_count}")
-                    
-                    if self.heartbeat_failed_count >= self.max_heartbeat_failures:
-                        logging.error("[KOOK] 心跳失败次数过多，准备重连")
-                        self.running = False
-                        break
+                if not await self._probe():
+                    logging.error("[KOOK] 心跳连续无响应，准备重连")
+                    await self._disconnect()
+                    break
                         
             except asyncio.CancelledError:
                 break
@@ -219,6 +735,23 @@ class KookClient:
                 logging.error(f"[KOOK] 心跳异常: {e}")
                 self.heartbeat_failed_count += 1
 
+    async def _probe(self):
+        """发送PING并等待响应，返回连接是否存活"""
+        timeout = self.heartbeat.timeout()
+        while self.running:
+            await self._send_ping()
+            if await self.heartbeat.wait_pong(timeout) or self.heartbeat.frames_since_ping():
+                # PONG之外的帧同样证明连接存活，失败计数一并清零
+                self.heartbeat_failed_count = 0
+                return True
+            self.heartbeat_failed_count += 1
+            metrics.inc("kook_heartbeat_timeouts_total")
+            logging.warning(f"[KOOK] 心跳超时（{timeout:.1f}秒），失败次数: {self.heartbeat_failed_count}")
+            if self.heartbeat_failed_count >= self.max_heartbeat_failures:
+                return False
+            timeout = min(timeout * 2, self.heartbeat_timeout)
+        return True
+
     async def _send_ping(self):
         """发送心跳PING"""
         try:
@@ -226,11 +759,21 @@ class KookClient:
                 "s": 2,
                 "sn": self.last_sn
             }
-            await self.ws.send(json.dumps(ping_data))
-            logging.debug(f"[KOOK] 发送心跳，sn: {self.last_sn}")
+            self.heartbeat.ping_sent()
+            await self.ws.send(json_dumps(ping_data))
+            if LOGGING_CONFIG["enable_heartbeat_logs"]:
+                logging.debug("[KOOK] 发送心跳，sn: %s", self.last_sn)
         except Exception as e:
             logging.error(f"[KOOK] 发送心跳失败: {e}")
 
+    async def _send_resume(self):
+        """发送RESUME信令，请求服务端补发断线期间的消息"""
+        try:
+            await self.ws.send(json_dumps({"s": 4, "sn": self.last_sn}))
+            logging.info(f"[KOOK] 发送Resume，sn: {self.last_sn}")
+        except Exception as e:
+            logging.error(f"[KOOK] 发送Resume失败: {e}")
+
     async def reconnect(self):
         """重连方法"""
         logging.info(f"[KOOK] 开始重连，延迟: {self.reconnect_delay}秒")
@@ -244,7 +787,7 @@ class KookClient:
         
         if success:
             # 重连成功，重置延迟
-            self.reconnect_delay = 1
+            self.reconnect_delay = CONNECTION_CONFIG["initial_reconnect_delay"]
             logging.info("[KOOK] 重连成功")
         else:
             # 重连失败，增加延迟（指数退避）
@@ -253,64 +796,119 @@ class KookClient:
         
         return success
 
-    async def send_text(self, channel_id, content):
-        """发送文本消息"""
-        url = "https://www.kookapp.cn/api/v3/message/create"
-        headers = {
-            "Authorization": f"Bot {self.token}",
-            "Content-Type": "application/json"
-        }
+    async def send_message(self, channel_id, content, msg_type=None, direct=False):
+        """发送消息，成功时返回接口数据（包含 msg_id），失败返回 None
+
+        direct 为 True 时发送私信，channel_id 为对方的用户ID。
+        可恢复的失败（5xx、429、网络错误）进入该频道的重试队列并返回 PENDING，
+        之后发往同一频道的消息排在其后，按序发送。
+        """
+        msg_type = msg_type or KookMessageType.KMARKDOWN
+        type_name = MESSAGE_TYPE_NAMES.get(msg_type, str(msg_type))
         payload = {
             "target_id": channel_id,
             "content": content,
-            "type": 1
+            "type": msg_type
         }
         
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, headers=headers, json=payload) as resp:
-                    if resp.status == 200:
-                        result = await resp.json()
-                        if result.get('code') == 0:
-                            logging.info(f"[KOOK] 发送文本消息成功")
-                        else:
-                            logging.error(f"[KOOK] 发送文本消息失败: {result}")
-                    else:
-                        logging.error(f"[KOOK] 发送文本消息HTTP错误: {resp.status}")
+            route = "direct-message/create" if direct else "message/create"
+            return await self.delivery.deliver(route, payload, f"发送{type_name}消息")
         except Exception as e:
-            logging.error(f"[KOOK] 发送文本消息异常: {e}")
+            logging.error(f"[KOOK] 发送{type_name}消息异常: {e}")
+        return None
 
-    async def send_image(self, channel_id, image_url):
-        """发送图片消息"""
-        url = "https://www.kookapp.cn/api/v3/message/create"
-        headers = {
-            "Authorization": f"Bot {self.token}",
-            "Content-Type": "application/json"
-        }
+    async def update_message(self, msg_id, content, direct=False):
+        """编辑已发送的消息（仅支持KMarkdown与卡片消息），返回是否成功"""
         payload = {
-            "target_id": channel_id,
-            "content": image_url,
-            "type": 2
+            "msg_id": msg_id,
+            "content": content
         }
         
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, headers=headers, json=payload) as resp:
-                    if resp.status == 200:
-                        result = await resp.json()
-                        if result.get('code') == 0:
-                            logging.info(f"[KOOK] 发送图片消息成功")
-                        else:
-                            logging.error(f"[KOOK] 发送图片消息失败: {result}")
-                    else:
-                        logging.error(f"[KOOK] 发送图片消息HTTP错误: {resp.status}")
+            route = "direct-message/update" if direct else "message/update"
+            status, result = await self._request("POST", route, json=payload)
+            if status == 200 and result.get('code') == 0:
+                return True
+            logging.error(f"[KOOK] 编辑消息失败: {status} {result}")
         except Exception as e:
-            logging.error(f"[KOOK] 发送图片消息异常: {e}")
+            logging.error(f"[KOOK] 编辑消息异常: {e}")
+        return False
+
+    async def send_text(self, channel_id, content, direct=False):
+        """发送文本消息"""
+        return await self.send_message(channel_id, content, KookMessageType.TEXT, direct)
+
+    async def send_image(self, channel_id, image_url, direct=False):
+        """发送图片消息"""
+        return await self.send_message(channel_id, image_url, KookMessageType.IMAGE, direct)
+
+    async def upload_asset(self, source, filename="image.png"):
+        """上传文件（asset/create），source 为本地路径或 bytes，成功返回资源URL
+
+        本地文件以流的方式上传，不整体读入内存。
+        """
+        opened = []
+
+        def build_form():
+            form = aiohttp.FormData()
+            if isinstance(source, (bytes, bytearray)):
+                payload = bytes(source)
+            else:
+                payload = open(source, "rb")
+                opened.append(payload)
+            form.add_field("file", payload, filename=filename)
+            return form
+
+        try:
+            status, result = await self._request("POST", "asset/create", data_factory=build_form)
+            if status == 200 and result.get('code') == 0:
+                url = result["data"]["url"]
+                logging.info(f"[KOOK] 上传资源成功: {url}")
+                return url
+            logging.error(f"[KOOK] 上传资源失败: {status} {result}")
+        except Exception as e:
+            logging.error(f"[KOOK] 上传资源异常: {e}")
+        finally:
+            for f in opened:
+                f.close()
+        return None
+
+    async def download_file(self, url, path, max_size=None):
+        """通过共享的HTTP会话将URL下载到本地文件，成功返回文件大小，失败返回 None
+
+        资源域名无需鉴权，请求不携带Token；响应体分块写入，不整体读入内存。
+        """
+        session = self._get_http_session()
+        async with session.get(url) as resp:
+            if resp.status != 200:
+                logging.warning(f"[KOOK] 下载文件失败: {resp.status} {url}")
+                return None
+            if max_size and (resp.content_length or 0) > max_size:
+                logging.warning(f"[KOOK] 文件超过大小上限，跳过下载: {url}")
+                return None
+            size = 0
+            with open(path, "wb") as f:
+                async for chunk in resp.content.iter_chunked(HTTP_CHUNK_SIZE):
+                    size += len(chunk)
+                    if max_size and size > max_size:
+                        logging.warning(f"[KOOK] 文件超过大小上限，跳过下载: {url}")
+                        return None
+                    f.write(chunk)
+        return size
 
     async def close(self):
         """关闭连接"""
         self.running = False
         
+        if self._listen_task and not self._listen_task.done():
+            self._listen_task.cancel()
+            try:
+                await self._listen_task
+            except asyncio.CancelledError:
+                pass
+        self._set_state(ConnectionState.DISCONNECTED)
+        
         if self.heartbeat_task:
             self.heartbeat_task.cancel()
             try:
@@ -324,4 +922,34 @@ class KookClient:
             except Exception as e:
                 logging.error(f"[KOOK] 关闭WebSocket异常: {e}")
         
+        if self._gap_task and not self._gap_task.done():
+            self._gap_task.cancel()
+        
+        if self._checkpoint_task:
+            self._checkpoint_task.cancel()
+            try:
+                await self._checkpoint_task
+            except asyncio.CancelledError:
+                pass
+            self._checkpoint_task = None
+        
+        if self._gateway_task:
+            self._gateway_task.cancel()
+            try:
+                await self._gateway_task
+            except asyncio.CancelledError:
+                pass
+            self._gateway_task = None
+        self._save_checkpoint(force=True)
+        
+        if self.pipeline:
+            await self.pipeline.stop()
+        
+        await self.delivery.stop()
+        await self.assets.close()
+        if self.manager:
+            await self.manager.unregister(self)
+        else:
+            await self._close_http_session()
+        
         logging.info("[KOOK] 连接已关闭") 
\ No newline at end of file
@@ -1,18 +1,60 @@
+import asyncio
 from astrbot.api.event import AstrMessageEvent, MessageChain
-from astrbot.api.platform import AstrBotMessage, PlatformMetadata
+from astrbot.api.platform import AstrBotMessage, PlatformMetadata, MessageType
 from astrbot.api.message_components import Plain, Image
-from .kook_client import KookClient
+from .kook_client import KookClient, KookMessageType
+from .send_planner import card_fallback, plan_messages
+from .stream_writer import StreamWriter
 
 class KookEvent(AstrMessageEvent):
     def __init__(self, message_str: str, message_obj: AstrBotMessage, platform_meta: PlatformMetadata, session_id: str, client: KookClient):
         super().__init__(message_str, message_obj, platform_meta, session_id)
         self.client = client
         self.channel_id = message_obj.group_id or message_obj.session_id
+        # 私聊消息通过私信接口发送
+        self.direct = message_obj.type == MessageType.FRIEND_MESSAGE
+
+    @staticmethod
+    async def send_with_client(client: KookClient, message: MessageChain, target_id: str, direct: bool = False):
+        """通过客户端将消息链发送到频道或私信"""
+        # 并发上传本地/base64图片（已上传过的内容直接命中缓存）
+        images = [comp for comp in message.chain if isinstance(comp, Image)]
+        urls = await asyncio.gather(*(client.assets.resolve(img.file) for img in images))
+        image_urls = {id(img): url for img, url in zip(images, urls)}
+        
+        # 合并相邻的文本与图片，尽量减少接口调用次数
+        for msg_type, content in plan_messages(message.chain, image_urls):
+            data = await client.send_message(target_id, content, msg_type, direct)
+            if data is None and msg_type == KookMessageType.CARD:
+                # 卡片被拒绝（如图片地址无法转存）时改为分别发送文本与图片，至少保证文本送达
+                for fallback_type, fallback in card_fallback(content):
+                    await client.send_message(target_id, fallback, fallback_type, direct)
 
     async def send(self, message: MessageChain):
-        for i in message.chain:
-            if isinstance(i, Plain):
-                await self.client.send_text(self.channel_id, i.text)
-            elif isinstance(i, Image):
-                await self.client.send_image(self.channel_id, i.file)
-        await super().send(message) 
\ No newline at end of file
+        await self.send_with_client(self.client, message, self.channel_id, self.direct)
+        await super().send(message)
+
+    async def send_streaming(self, generator, use_fallback: bool = False):
+        """流式发送：先发出首段文本，再以节流的 message/update 增量编辑"""
+        writer = StreamWriter(self.client, self.channel_id, direct=self.direct)
+        try:
+            async for chain in generator:
+                if not isinstance(chain, MessageChain):
+                    continue
+                if getattr(chain, "type", None) == "break":
+                    # 分段符：定稿当前消息，后续内容另起一条
+                    await writer.finish()
+                    continue
+                others = []
+                for comp in chain.chain:
+                    if isinstance(comp, Plain):
+                        await writer.append(comp.text)
+                    else:
+                        others.append(comp)
+                if others:
+                    # 图片等非文本内容走普通发送流程
+                    await writer.finish()
+                    await self.send(MessageChain(others))
+        finally:
+            await writer.finish()
+        return await super().send_streaming(generator, use_fallback)
\ No newline at end of file
@@ -0,0 +1,87 @@
+from astrbot.api.platform import AstrBotMessage
+from .codec import json_loads
+
+
+class KookMessage(AstrBotMessage):
+    """KOOK消息对象，消息组件在首次访问 message 时才构建
+
+    被预过滤或未唤醒的消息通常不会用到组件，延迟构建可省去这部分开销。
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._message = None
+        self._component_factory = None
+
+    @property
+    def message(self):
+        if self._message is None:
+            factory, self._component_factory = self._component_factory, None
+            self._message = factory() if factory else []
+        return self._message
+
+    @message.setter
+    def message(self, value):
+        self._message = value
+        self._component_factory = None
+
+    def set_message_factory(self, factory):
+        """设置构建消息组件的函数，首次访问 message 时调用"""
+        self._message = None
+        self._component_factory = factory
+
+
+class KookEventRecord:
+    """入站消息的精简记录，作为 AstrBotMessage.raw_message
+
+    只保留适配器与 handle_msg 用到的小字段；完整的事件数据（包括消息正文）以原始报文（bytes）保存，
+    访问 raw（或像 dict 一样 get / 下标取值）时才解析并缓存，
+    从而避免每条消息都长期持有整棵嵌套的 dict 或正文的第二份副本。
+    """
+
+    __slots__ = (
+        "msg_id", "type", "channel_type", "target_id", "author_id", "author_name",
+        "guild_id", "msg_timestamp", "mention", "mention_roles", "mention_all",
+        "_frame", "_raw",
+    )
+
+    def __init__(self, data, frame=None):
+        extra = data.get('extra') or {}
+        self.msg_id = data.get('msg_id')
+        self.type = data.get('type')
+        self.channel_type = data.get('channel_type')
+        self.target_id = data.get('target_id')
+        self.author_id = data.get('author_id')
+        self.author_name = (extra.get('author') or {}).get('username', '')
+        self.guild_id = extra.get('guild_id')
+        self.msg_timestamp = data.get('msg_timestamp')
+        self.mention = tuple(extra.get('mention') or ())
+        self.mention_roles = tuple(str(role) for role in extra.get('mention_roles') or ())
+        self.mention_all = bool(extra.get('mention_all'))
+        # 没有原始报文时（如直接调用 convert_message）只能保留原对象
+        self._frame = frame
+        self._raw = None if frame is not None else data
+
+    @property
+    def raw(self):
+        """完整的事件数据（d），首次访问时从原始报文解析"""
+        if self._raw is None:
+            self._raw = json_loads(self._frame).get('d') or {}
+        return self._raw
+
+    @property
+    def content(self):
+        """消息正文，从原始报文中取得"""
+        return self.raw.get('content')
+
+    def get(self, key, default=None):
+        return self.raw.get(key, default)
+
+    def __getitem__(self, key):
+        return self.raw[key]
+
+    def __contains__(self, key):
+        return key in self.raw
+
+    def __repr__(self):
+        return f"KookEventRecord(msg_id={self.msg_id!r}, type={self.type!r}, target_id={self.target_id!r})"
@@ -0,0 +1,206 @@
+import asyncio
+import hashlib
+import logging
+import os
+import re
+from collections import OrderedDict
+from urllib.parse import urlparse
+from .metrics import metrics
+
+_SAFE_SUFFIX = re.compile(r"^\.[A-Za-z0-9]{1,8}$")
+
+
+def _url_digest(url):
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+
+def _suffix(url):
+    """保留URL中的扩展名，便于下游按文件名判断图片格式"""
+    suffix = os.path.splitext(urlparse(url).path)[1]
+    return suffix.lower() if _SAFE_SUFFIX.match(suffix) else ""
+
+
+class MediaCache:
+    """URL -> 本地文件 的磁盘缓存，按总大小淘汰最久未使用的文件（LRU）
+
+    文件名为URL的 sha256，启动时扫描目录重建索引（按修改时间排序），
+    命中时更新文件的修改时间，重启后仍能保持使用顺序。
+    """
+
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # URL哈希 -> (路径, 大小)
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    def _load(self):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            files = []
+            for entry in os.scandir(self.directory):
+                if not entry.is_file():
+                    continue
+                if entry.name.endswith(".part"):  # 上次未下载完的文件
+                    os.remove(entry.path)
+                    continue
+                stat = entry.stat()
+                files.append((stat.st_mtime, entry.name, entry.path, stat.st_size))
+        except Exception as e:
+            logging.warning(f"[KOOK] 读取媒体缓存目录失败: {e}")
+            return
+        for _, name, path, size in sorted(files):
+            self._entries[os.path.splitext(name)[0]] = (path, size)
+            self.total_bytes += size
+        self._evict()
+
+    def path_for(self, url):
+        """URL对应的缓存文件路径"""
+        return os.path.join(self.directory, _url_digest(url) + _suffix(url))
+
+    def get(self, url):
+        """返回已缓存的本地路径，未缓存时返回 None"""
+        digest = _url_digest(url)
+        entry = self._entries.get(digest)
+        if entry is None or not os.path.exists(entry[0]):
+            if entry is not None:
+                self._discard(digest)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(digest)
+        try:
+            os.utime(entry[0])
+        except OSError:
+            pass
+        self.hits += 1
+        return entry[0]
+
+    def put(self, url, path, size):
+        digest = _url_digest(url)
+        self._discard(digest)
+        self._entries[digest] = (path, size)
+        self.total_bytes += size
+        self._evict()
+
+    def _discard(self, digest):
+        entry = self._entries.pop(digest, None)
+        if entry is not None:
+            self.total_bytes -= entry[1]
+
+    def _evict(self):
+        # 至少保留最新的一个文件，即使它本身超过上限
+        while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+            _, (path, size) = self._entries.popitem(last=False)
+            self.total_bytes -= size
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class MediaPrefetcher:
+    """入站图片预取
+
+    收到带图片的消息时通过客户端共享的HTTP会话在后台并发下载，同一URL同时只下载一次，
+    结果写入 MediaCache。消息组件指向本地文件，尚未下载完成的图片在下游需要文件时等待同一下载任务，
+    下游（多模态模型、OCR、日志插件等）无需重复下载。
+    """
+
+    def __init__(self, client, cache_dir, max_bytes=256 * 1024 * 1024, concurrency=8,
+                 max_file_size=20 * 1024 * 1024):
+        self.client = client
+        self.cache = MediaCache(cache_dir, max_bytes=max_bytes)
+        self.max_file_size = max_file_size
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._inflight = {}  # URL -> 正在进行的下载任务
+        self.downloads = 0
+        self.failures = 0
+
+    async def fetch(self, url):
+        """返回URL对应的本地文件路径，下载失败时返回 None"""
+        path = self.cache.get(url)
+        if path:
+            metrics.inc("kook_media_prefetch_total", result="hit")
+            return path
+        return await asyncio.shield(self._start(url))
+
+    def start(self, urls):
+        """在后台开始预取一组URL，不等待下载完成；需要文件时通过 fetch 等待同一下载任务"""
+        for url in dict.fromkeys(urls):
+            if url in self._inflight:
+                continue
+            if self.cache.get(url):
+                metrics.inc("kook_media_prefetch_total", result="hit")
+            else:
+                self._start(url)
+
+    def cached(self, url):
+        """已下载到本地时返回路径，仍在下载或未缓存时返回 None，不发起下载"""
+        if url in self._inflight:
+            return None
+        return self.cache.get(url)
+
+    def _start(self, url):
+        # 同一URL同时只下载一次
+        task = self._inflight.get(url)
+        if task is None:
+            task = asyncio.ensure_future(self._download(url))
+            self._inflight[url] = task
+            task.add_done_callback(lambda _: self._inflight.pop(url, None))
+        return task
+
+    async def _download(self, url):
+        path = self.cache.path_for(url)
+        tmp_path = f"{path}.part"
+        start = metrics.clock()
+        try:
+            async with self._semaphore:
+                size = await self.client.download_file(url, tmp_path, self.max_file_size)
+            if size is None:
+                raise RuntimeError("下载失败")
+            os.replace(tmp_path, path)
+        except asyncio.CancelledError:
+            self._remove(tmp_path)
+            raise
+        except Exception as e:
+            self._remove(tmp_path)
+            self.failures += 1
+            metrics.inc("kook_media_prefetch_total", result="error")
+            logging.warning(f"[KOOK] 预取图片失败: {url} {e}")
+            return None
+        self.downloads += 1
+        self.cache.put(url, path, size)
+        metrics.inc("kook_media_prefetch_total", result="miss")
+        metrics.observe_since("kook_media_download_seconds", start)
+        return path
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    async def close(self):
+        """取消尚未完成的下载"""
+        tasks = list(self._inflight.values())
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self):
+        return {
+            "cached": len(self.cache),
+            "cached_bytes": self.cache.total_bytes,
+            "hits": self.cache.hits,
+            "misses": self.cache.misses,
+            "downloads": self.downloads,
+            "failures": self.failures,
+            "inflight": len(self._inflight),
+        }
@@ -0,0 +1,248 @@
+import bisect
+import logging
+import time
+from aiohttp import web
+from .config import METRICS_CONFIG
+
+# 耗时直方图的桶上界（秒）
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+# 指标说明，用于Prometheus输出的 HELP 行
+METRIC_HELP = {
+    "kook_frames_received_total": "收到的WebSocket帧数",
+    "kook_frame_bytes_total": "收到的WebSocket帧字节数",
+    "kook_frame_decode_seconds": "帧解压与JSON解析耗时",
+    "kook_events_dispatched_total": "按序投递到处理流水线的事件数",
+    "kook_sn_gap": "最新收到的sn与已投递sn之间的差值",
+    "kook_pipeline_wait_seconds": "任务在流水线队列中的等待时间",
+    "kook_pipeline_handle_seconds": "流水线处理单个任务的耗时",
+    "kook_convert_seconds": "convert_message 耗时",
+    "kook_commit_seconds": "构建事件并 commit_event 的耗时",
+    "kook_send_seconds": "出站HTTP请求耗时",
+    "kook_send_total": "出站HTTP请求数",
+    "kook_rate_limit_wait_seconds": "请求在速率限制器中的排队时间",
+    "kook_rate_limited_total": "收到429的次数",
+    "kook_heartbeat_rtt_seconds": "心跳PING到PONG的往返时间",
+    "kook_heartbeat_timeouts_total": "心跳超时次数",
+    "kook_reconnects_total": "断线后重连成功的次数",
+    "kook_reconnect_seconds": "从断线到重连成功的耗时",
+    "kook_connect_failures_total": "连接失败次数",
+}
+
+
+class Histogram:
+    """固定桶的耗时直方图"""
+
+    __slots__ = ("buckets", "counts", "count", "sum", "max")
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # 最后一个为 +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """按桶线性插值估算分位数"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for i, n in enumerate(self.counts):
+            upper = self.buckets[i] if i < len(self.buckets) else self.max
+            if n and seen + n >= rank:
+                return min(lower + (upper - lower) * (rank - seen) / n, self.max)
+            seen += n
+            lower = upper
+        return self.max
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "avg": round(self.sum / self.count, 6) if self.count else 0.0,
+            "p50": round(self.quantile(0.5), 6),
+            "p99": round(self.quantile(0.99), 6),
+            "max": round(self.max, 6),
+        }
+
+
+class Metrics:
+    """进程内的计数器、仪表与耗时直方图
+
+    关闭时各记录方法在入口处直接返回；热路径上用 clock() 取起始时间，
+    关闭时返回 0 且不读取时钟，因此未启用监控的开销只有一次属性判断。
+    标签以关键字参数传入，取值应是有限集合（如接口路径、结果类型）。
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+
+    def clock(self):
+        """耗时统计的起点"""
+        return time.perf_counter() if self.enabled else 0.0
+
+    def inc(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        self._counters[key] = self._counters.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        if not self.enabled:
+            return
+        self._gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def observe(self, name, value, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = self._histograms[key] = Histogram()
+        histogram.observe(value)
+
+    def observe_since(self, name, start, **labels):
+        """记录自 clock() 以来的耗时"""
+        if not self.enabled or not start:
+            return
+        self.observe(name, time.perf_counter() - start, **labels)
+
+    def reset(self):
+        self._counters.clear()
+        self._gauges.clear()
+        self._histograms.clear()
+
+    def snapshot(self):
+        """获取当前所有指标，键为带标签的指标名"""
+        return {
+            "enabled": self.enabled,
+            "counters": {_format_key(k): v for k, v in self._counters.items()},
+            "gauges": {_format_key(k): v for k, v in self._gauges.items()},
+            "histograms": {_format_key(k): h.snapshot() for k, h in self._histograms.items()},
+        }
+
+    def render_prometheus(self):
+        """以Prometheus文本格式输出所有指标"""
+        lines = []
+        described = set()
+
+        def describe(name, kind):
+            if name in described:
+                return
+            described.add(name)
+            if name in METRIC_HELP:
+                lines.append(f"# HELP {name} {METRIC_HELP[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in sorted(self._counters.items()):
+            describe(name, "counter")
+            lines.append(f"{_format_key((name, labels))} {value}")
+        for (name, labels), value in sorted(self._gauges.items()):
+            describe(name, "gauge")
+            lines.append(f"{_format_key((name, labels))} {value}")
+        for (name, labels), histogram in sorted(self._histograms.items()):
+            describe(name, "histogram")
+            cumulative = 0
+            for bound, n in zip(histogram.buckets + ("+Inf",), histogram.counts):
+                cumulative += n
+                lines.append(f"{_format_key((name + '_bucket', labels + (('le', bound),)))} {cumulative}")
+            lines.append(f"{_format_key((name + '_sum', labels))} {histogram.sum}")
+            lines.append(f"{_format_key((name + '_count', labels))} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_key(key):
+    name, labels = key
+    if not labels:
+        return name
+    body = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+    return f"{name}{{{body}}}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+metrics = Metrics(enabled=METRICS_CONFIG["enabled"])
+
+
+class MetricsExporter:
+    """Prometheus 指标端点（GET 返回文本格式的指标）"""
+
+    def __init__(self, registry, host="127.0.0.1", port=9464, path="/metrics"):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self.path = path
+        self._runner = None
+
+    async def start(self):
+        async def handle(request):
+            return web.Response(
+                text=self.registry.render_prometheus(),
+                content_type="text/plain",
+                charset="utf-8",
+            )
+
+        app = web.Application()
+        app.router.add_get(self.path, handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logging.info(f"[KOOK] 指标端点已启动: http://{self.host}:{self.port}{self.path}")
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+_exporter = None
+_exporter_users = 0
+
+
+async def acquire_exporter():
+    """按配置启动进程内共享的指标端点（多个机器人只启动一次）"""
+    global _exporter, _exporter_users
+    if not (METRICS_CONFIG["enabled"] and METRICS_CONFIG["exporter_enabled"]):
+        return
+    _exporter_users += 1
+    if _exporter is not None:
+        return
+    exporter = MetricsExporter(
+        metrics,
+        host=METRICS_CONFIG["exporter_host"],
+        port=METRICS_CONFIG["exporter_port"],
+        path=METRICS_CONFIG["exporter_path"],
+    )
+    try:
+        await exporter.start()
+        _exporter = exporter
+    except OSError as e:
+        logging.error(f"[KOOK] 启动指标端点失败: {e}")
+
+
+async def release_exporter():
+    """最后一个使用者释放时关闭指标端点"""
+    global _exporter, _exporter_users
+    if _exporter_users <= 0:
+        return
+    _exporter_users -= 1
+    if _exporter_users == 0 and _exporter is not None:
+        exporter, _exporter = _exporter, None
+        await exporter.stop()
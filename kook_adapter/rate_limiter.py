@@ -0,0 +1,172 @@
+import asyncio
+import logging
+import time
+from .metrics import metrics
+
+
+class RateLimitBucket:
+    """单个速率限制桶（令牌桶），根据KOOK返回的响应头自动校准"""
+
+    def __init__(self, name, limit, window):
+        self.name = name
+        self.limit = limit
+        self.window = window
+        self.tokens = float(limit)
+        self.last_refill = time.monotonic()
+        self.reset_at = None  # 服务端告知的重置时间（monotonic）
+        self.blocked_until = 0.0  # 收到429后的封锁截止时间
+        self.queue_depth = 0  # 正在排队等待的请求数
+        self.last_wait = 0.0
+        self.total_wait = 0.0
+        self.throttled_count = 0  # 收到429的次数
+        self._lock = asyncio.Lock()  # asyncio.Lock按FIFO顺序唤醒，等价于排队
+
+    def _refill(self, now):
+        """补充令牌"""
+        if self.reset_at is not None:
+            # 已从响应头得知窗口信息，按服务端窗口重置
+            if now >= self.reset_at:
+                self.tokens = float(self.limit)
+                self.reset_at = None
+                self.last_refill = now
+            return
+        elapsed = now - self.last_refill
+        if elapsed > 0:
+            rate = self.limit / self.window
+            self.tokens = min(float(self.limit), self.tokens + elapsed * rate)
+            self.last_refill = now
+
+    def _next_available(self, now):
+        """计算下一个令牌可用的时间点"""
+        if self.reset_at is not None:
+            return self.reset_at
+        rate = self.limit / self.window
+        return now + (1 - self.tokens) / rate
+
+    async def acquire(self, enabled=True):
+        """获取一个令牌，不足时排队等待，返回等待时长（秒）"""
+        start = time.monotonic()
+        self.queue_depth += 1
+        try:
+            async with self._lock:
+                while True:
+                    now = time.monotonic()
+                    if now < self.blocked_until:
+                        await asyncio.sleep(self.blocked_until - now)
+                        continue
+                    if not enabled:
+                        break
+                    self._refill(now)
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        break
+                    await asyncio.sleep(max(self._next_available(now) - now, 0.01))
+        finally:
+            self.queue_depth -= 1
+        waited = time.monotonic() - start
+        self.last_wait = waited
+        self.total_wait += waited
+        return waited
+
+    def update(self, limit=None, remaining=None, reset=None):
+        """根据响应头更新桶状态"""
+        now = time.monotonic()
+        if limit:
+            self.limit = limit
+        if remaining is not None:
+            # 以服务端为准，但不回补本地已预扣的令牌
+            self.tokens = min(self.tokens, float(remaining))
+        if reset is not None:
+            self.reset_at = now + reset
+
+    def block(self, seconds):
+        """收到429时暂停整个桶"""
+        self.throttled_count += 1
+        self.tokens = 0.0
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    def stats(self):
+        now = time.monotonic()
+        return {
+            "limit": self.limit,
+            "remaining": int(self.tokens),
+            "reset_in": round(max((self.reset_at or now) - now, 0.0), 3),
+            "queue_depth": self.queue_depth,
+            "last_wait": round(self.last_wait, 3),
+            "total_wait": round(self.total_wait, 3),
+            "throttled_count": self.throttled_count,
+        }
+
+
+class RateLimiter:
+    """按桶调度KOOK REST请求的速率限制器
+
+    KOOK通过 X-Rate-Limit-* 响应头告知每个桶的限额，本类据此学习限额并让请求排队，
+    使持续吞吐量保持在服务端限制之下，而不是触发429后丢弃消息。
+    """
+
+    def __init__(self, enabled=True, default_limit=100, default_window=60):
+        self.enabled = enabled
+        self.default_limit = default_limit
+        self.default_window = default_window
+        self._buckets = {}
+        self._routes = {}  # 接口路径 -> 服务端告知的桶名
+        self._global = RateLimitBucket("global", default_limit, default_window)
+
+    def get_bucket(self, route):
+        name = self._routes.get(route, route)
+        bucket = self._buckets.get(name)
+        if bucket is None:
+            bucket = RateLimitBucket(name, self.default_limit, self.default_window)
+            self._buckets[name] = bucket
+        return bucket
+
+    async def acquire(self, route):
+        """请求发出前调用，返回排队等待时长（秒）"""
+        # 全局限制只在收到全局429时生效
+        waited = await self._global.acquire(enabled=False)
+        waited += await self.get_bucket(route).acquire(self.enabled)
+        metrics.observe("kook_rate_limit_wait_seconds", waited)
+        return waited
+
+    def update(self, route, headers, status=200):
+        """请求完成后调用，根据响应头和状态码更新桶"""
+        bucket_name = headers.get("X-Rate-Limit-Bucket")
+        if bucket_name and self._routes.get(route) != bucket_name:
+            # 首次得知桶名时，把按路径建立的临时桶迁移过去
+            old = None if route in self._routes else self._buckets.pop(route, None)
+            self._routes[route] = bucket_name
+            if old is not None and bucket_name not in self._buckets:
+                old.name = bucket_name
+                self._buckets[bucket_name] = old
+        bucket = self.get_bucket(route)
+
+        limit = _parse_number(headers.get("X-Rate-Limit-Limit"), int)
+        remaining = _parse_number(headers.get("X-Rate-Limit-Remaining"), int)
+        reset = _parse_number(headers.get("X-Rate-Limit-Reset"), float)
+        bucket.update(limit, remaining, reset)
+
+        if status == 429:
+            metrics.inc("kook_rate_limited_total")
+            wait = reset if reset is not None else 1.0
+            if headers.get("X-Rate-Limit-Global") is not None:
+                self._global.block(wait)
+                logging.warning(f"[KOOK] 触发全局速率限制，暂停 {wait} 秒")
+            else:
+                bucket.block(wait)
+                logging.warning(f"[KOOK] 触发速率限制 {bucket.name}，暂停 {wait} 秒")
+
+    def stats(self):
+        """获取各桶当前的排队深度与等待时间"""
+        result = {name: bucket.stats() for name, bucket in self._buckets.items()}
+        result["global"] = self._global.stats()
+        return result
+
+
+def _parse_number(value, cast):
+    if value is None:
+        return None
+    try:
+        return cast(value)
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,61 @@
+import asyncio
+import logging
+import time
+
+# 会影响机器人角色的系统事件（extra.type）
+ROLE_EVENT_TYPES = frozenset({
+    "added_role",
+    "deleted_role",
+    "updated_role",
+    "updated_guild_member",
+})
+
+
+class BotRoleCache:
+    """机器人在各服务器中的角色ID缓存（带TTL）
+
+    首次用到某个服务器时才拉取（guild/user-view），过期或收到角色变更事件后失效，
+    判断 @角色 是否指向机器人只需一次集合查找。
+    """
+
+    def __init__(self, client, ttl=600):
+        self.client = client
+        self.ttl = ttl
+        self._roles = {}  # guild_id -> (过期时间, frozenset(角色ID))
+        self._inflight = {}
+
+    def invalidate(self, guild_id=None):
+        """使某个服务器（或全部）的缓存失效"""
+        if guild_id is None:
+            self._roles.clear()
+        else:
+            self._roles.pop(guild_id, None)
+
+    async def get(self, guild_id):
+        """获取机器人在服务器中的角色ID集合（字符串形式）"""
+        cached = self._roles.get(guild_id)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+
+        task = self._inflight.get(guild_id)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(guild_id))
+            self._inflight[guild_id] = task
+            task.add_done_callback(lambda _: self._inflight.pop(guild_id, None))
+        return await asyncio.shield(task)
+
+    async def _fetch(self, guild_id):
+        me_id = self.client.me_id or (await self.client.get_me() or {}).get('id')
+        if not me_id:
+            return frozenset()
+        user = await self.client.get_guild_user(guild_id, me_id)
+        if user is None:
+            # 拉取失败时短暂缓存空集合，避免每条消息都请求接口
+            roles = frozenset()
+            expires_at = time.monotonic() + min(self.ttl, 30)
+        else:
+            roles = frozenset(str(role) for role in user.get('roles') or ())
+            expires_at = time.monotonic() + self.ttl
+            logging.debug("[KOOK] 机器人在服务器 %s 的角色: %s", guild_id, roles)
+        self._roles[guild_id] = (expires_at, roles)
+        return roles
@@ -0,0 +1,118 @@
+from astrbot.api.message_components import Plain, Image
+from .config import MESSAGE_CONFIG
+from .kook_client import KookMessageType
+from .codec import json_dumps, json_loads
+
+
+def split_once(text, limit):
+    """在长度上限内切出一段，尽量在换行处断开，返回 (前段, 剩余部分)"""
+    cut = text.rfind("\n", 0, limit)
+    if cut <= 0:
+        cut = limit
+    return text[:cut], text[cut:].lstrip("\n")
+
+
+def split_text(text, limit):
+    """按长度上限拆分文本，尽量在换行处断开"""
+    chunks = []
+    while len(text) > limit:
+        head, text = split_once(text, limit)
+        chunks.append(head)
+    if text:
+        chunks.append(text)
+    return chunks
+
+
+def _collect_segments(chain, image_urls):
+    """将消息链归并为 ("text", str) / ("image", url) 段，相邻文本合并"""
+    segments = []
+    text_parts = []
+    for comp in chain:
+        if isinstance(comp, Plain):
+            text_parts.append(comp.text)
+        elif isinstance(comp, Image):
+            url = image_urls.get(id(comp), comp.file) if image_urls is not None else comp.file
+            if not url:
+                continue
+            if text_parts:
+                segments.append(("text", "".join(text_parts)))
+                text_parts = []
+            segments.append(("image", url))
+    if text_parts:
+        segments.append(("text", "".join(text_parts)))
+    return [seg for seg in segments if seg[0] == "image" or seg[1].strip()]
+
+
+def _build_cards(segments):
+    """将文本与图片段按原顺序排入卡片模块，超出模块上限时拆成多张卡片"""
+    max_text = MESSAGE_CONFIG["max_text_length"]
+    max_images = MESSAGE_CONFIG["max_container_images"]
+    modules = []
+    container = None
+    for kind, value in segments:
+        if kind == "text":
+            container = None
+            for chunk in split_text(value, max_text):
+                modules.append({
+                    "type": "section",
+                    "text": {"type": "kmarkdown", "content": chunk},
+                })
+        else:
+            if container is None or len(container["elements"]) >= max_images:
+                container = {"type": "container", "elements": []}
+                modules.append(container)
+            container["elements"].append({"type": "image", "src": value})
+
+    max_modules = MESSAGE_CONFIG["max_card_modules"]
+    cards = []
+    for i in range(0, len(modules), max_modules):
+        cards.append({
+            "type": "card",
+            "theme": MESSAGE_CONFIG["card_theme"],
+            "size": "lg",
+            "modules": modules[i:i + max_modules],
+        })
+    return cards
+
+
+def plan_messages(chain, image_urls=None):
+    """为消息链生成发送计划，返回 [(消息类型, 内容)]
+
+    image_urls 为 {id(Image组件): 已上传的URL}，为 None 时直接使用 Image.file。
+
+    - 仅有文本时，相邻文本合并为一条KMarkdown消息；
+    - 仅有一张图片时，直接发送图片消息；
+    - 文本与图片混排（或多张图片）时，合并为一条卡片消息，保持原有顺序；
+    - 超出KOOK长度限制的内容拆分为多条。
+    """
+    segments = _collect_segments(chain, image_urls)
+    if not segments:
+        return []
+
+    images = [value for kind, value in segments if kind == "image"]
+    if not images:
+        text = "".join(value for _, value in segments)
+        return [
+            (KookMessageType.KMARKDOWN, chunk)
+            for chunk in split_text(text, MESSAGE_CONFIG["max_text_length"])
+        ]
+    if len(segments) == 1:
+        return [(KookMessageType.IMAGE, images[0])]
+
+    return [
+        (KookMessageType.CARD, json_dumps([card]))
+        for card in _build_cards(segments)
+    ]
+
+
+def card_fallback(content):
+    """卡片被拒绝时的降级计划：按原顺序拆成KMarkdown与图片消息，返回 [(消息类型, 内容)]"""
+    plan = []
+    for card in json_loads(content):
+        for module in card.get("modules") or ():
+            if module.get("type") == "section":
+                plan.append((KookMessageType.KMARKDOWN, module["text"]["content"]))
+            elif module.get("type") == "container":
+                for element in module.get("elements") or ():
+                    plan.append((KookMessageType.IMAGE, element["src"]))
+    return plan
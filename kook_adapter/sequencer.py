@@ -0,0 +1,122 @@
+import time
+from collections import OrderedDict
+
+
+class EventSequencer:
+    """网关事件排序与去重
+
+    - 按 sn 维护一个小的滑动窗口重排缓冲区，保证事件按序投递；
+    - 已投递过的 sn（如 RESUME 后补发的帧）直接丢弃；
+    - 用带 TTL 的 LRU 记录最近的 msg_id，跨会话去重；
+    - 缺失的 sn 在超时或窗口溢出后跳过，避免无限等待。
+    每个事件的处理均为 O(1)，内存占用有上限。
+    """
+
+    def __init__(self, window=64, gap_timeout=1.0, dedup_size=4096, dedup_ttl=600, last_sn=0):
+        self.window = window
+        self.gap_timeout = gap_timeout
+        self.dedup_size = dedup_size
+        self.dedup_ttl = dedup_ttl
+        self.last_sn = last_sn  # 最后一个按序投递的 sn，新会话为 0（KOOK的sn从1开始）
+        self._pending = {}  # sn -> 事件
+        self._gap_since = None  # 出现缺口的时间
+        self._seen = OrderedDict()  # msg_id -> 过期时间
+        self.reordered = 0
+        self.duplicates = 0
+        self.gap_skipped = 0
+
+    @property
+    def pending(self):
+        return len(self._pending)
+
+    def reset(self, last_sn=0):
+        """会话重置后 sn 从1重新计数，清空重排缓冲区（保留 msg_id 去重记录）"""
+        self.last_sn = last_sn
+        self._pending.clear()
+        self._gap_since = None
+
+    def push(self, data):
+        """接收一个事件帧，返回可按序投递的事件列表"""
+        sn = data.get('sn')
+        if sn is None:
+            return [data] if self.accept(data) else []
+
+        if sn <= self.last_sn or sn in self._pending:
+            self.duplicates += 1
+            return []
+
+        if sn != self.last_sn + 1:
+            self._pending[sn] = data
+            if self._gap_since is None:
+                self._gap_since = time.monotonic()
+            if len(self._pending) > self.window:
+                return self._skip_gap()
+            return []
+
+        ready = []
+        if self.accept(data):
+            ready.append(data)
+        self.last_sn = sn
+        self._drain(ready)
+        return ready
+
+    def flush_expired(self):
+        """缺口等待超时后跳过缺失的 sn，返回可投递的事件列表"""
+        if not self._pending or self._gap_since is None:
+            return []
+        if time.monotonic() - self._gap_since < self.gap_timeout:
+            return []
+        return self._skip_gap()
+
+    def gap_deadline(self):
+        """当前缺口还需等待的秒数，没有缺口时返回 None"""
+        if self._gap_since is None:
+            return None
+        return max(self.gap_timeout - (time.monotonic() - self._gap_since), 0.0)
+
+    def _skip_gap(self):
+        next_sn = min(self._pending)
+        self.gap_skipped += next_sn - self.last_sn - 1
+        self.last_sn = next_sn - 1
+        ready = []
+        self._drain(ready)
+        return ready
+
+    def _drain(self, ready):
+        """投递缓冲区中已连续的事件"""
+        while self._pending:
+            data = self._pending.pop(self.last_sn + 1, None)
+            if data is None:
+                break
+            self.last_sn += 1
+            self.reordered += 1
+            if self.accept(data):
+                ready.append(data)
+        self._gap_since = time.monotonic() if self._pending else None
+
+    def accept(self, data):
+        """按 msg_id 去重，返回是否为新事件"""
+        msg_id = (data.get('d') or {}).get('msg_id')
+        if not msg_id:
+            return True
+        now = time.monotonic()
+        seen = self._seen
+        while seen:
+            expires_at = next(iter(seen.values()))
+            if expires_at > now and len(seen) < self.dedup_size:
+                break
+            seen.popitem(last=False)
+        if msg_id in seen:
+            self.duplicates += 1
+            return False
+        seen[msg_id] = now + self.dedup_ttl
+        return True
+
+    def stats(self):
+        return {
+            "last_sn": self.last_sn,
+            "pending": len(self._pending),
+            "reordered": self.reordered,
+            "duplicates": self.duplicates,
+            "gap_skipped": self.gap_skipped,
+        }
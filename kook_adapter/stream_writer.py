@@ -0,0 +1,109 @@
+import asyncio
+import time
+from .config import MESSAGE_CONFIG
+from .kook_client import KookMessageType
+from .delivery import PENDING
+from .send_planner import split_once, split_text
+
+
+class StreamWriter:
+    """流式回复写入器
+
+    收到第一段文本时立即创建一条KMarkdown消息，之后的增量通过 message/update 编辑该消息。
+    编辑按最小间隔合并，同一时间最多只有一个编辑请求在途，
+    因此无论到达多少 token，编辑次数都只与持续时间成正比。
+    """
+
+    def __init__(self, client, channel_id, interval=None, direct=False):
+        self.client = client
+        self.channel_id = channel_id
+        self.direct = direct
+        self.interval = interval if interval is not None else MESSAGE_CONFIG["stream_update_interval"]
+        self.limit = MESSAGE_CONFIG["max_text_length"]
+        self.msg_id = None
+        self.text = ""  # 当前消息的完整内容
+        self.sent = ""  # 已同步到KOOK的内容
+        self.last_edit = 0.0
+        self.edits = 0
+        self._failed = False  # 创建消息失败时退化为结束后一次性发送
+        self._queued = False  # 首段消息进入了重试队列，拿不到 msg_id，无法编辑
+        self._edit_task = None
+
+    async def append(self, delta):
+        """追加一段文本"""
+        if not delta:
+            return
+        self.text += delta
+        # 超出单条消息长度时，定稿当前消息并另起一条
+        while len(self.text) > self.limit:
+            self.text, tail = split_once(self.text, self.limit)
+            await self.finish()
+            self.text = tail
+        await self._sync()
+
+    async def _sync(self):
+        if self._failed or self._queued or not self.text.strip():
+            return
+        if self.msg_id is None:
+            # 首段文本立即发送，感知延迟即首 token 时间
+            content = self.text
+            data = await self.client.send_message(self.channel_id, content, KookMessageType.KMARKDOWN, self.direct)
+            if data is PENDING:
+                # 已排队等待重试，定稿时只补发之后的增量（同一频道内按序发送）
+                self._queued = True
+                self.sent = content
+                return
+            if not data or not data.get("msg_id"):
+                self._failed = True
+                return
+            self.msg_id = data["msg_id"]
+            self.sent = content
+            self.last_edit = time.monotonic()
+            return
+        if self.text != self.sent and (self._edit_task is None or self._edit_task.done()):
+            self._edit_task = asyncio.create_task(self._edit_later())
+
+    async def _edit_later(self):
+        """等到最小间隔后编辑一次，若期间又有新内容则继续排下一次"""
+        while self.text != self.sent:
+            delay = self.last_edit + self.interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await self._edit()
+
+    async def _edit(self):
+        content = self.text
+        self.last_edit = time.monotonic()
+        if await self.client.update_message(self.msg_id, content, self.direct):
+            self.edits += 1
+        # 编辑失败时不重试中间状态，交由下一次编辑或定稿覆盖
+        self.sent = content
+
+    async def finish(self):
+        """定稿：等待在途编辑完成，并把最终内容同步到KOOK"""
+        if self._edit_task and not self._edit_task.done():
+            self._edit_task.cancel()
+            try:
+                await self._edit_task
+            except asyncio.CancelledError:
+                pass
+        self._edit_task = None
+
+        if self._queued:
+            rest = self.text[len(self.sent):]
+            if rest.strip():
+                await self.client.send_message(self.channel_id, rest, KookMessageType.KMARKDOWN, self.direct)
+        elif self._failed:
+            for chunk in split_text(self.text, self.limit):
+                await self.client.send_message(self.channel_id, chunk, KookMessageType.KMARKDOWN, self.direct)
+        elif self.msg_id is None:
+            if self.text.strip():
+                await self.client.send_message(self.channel_id, self.text, KookMessageType.KMARKDOWN, self.direct)
+        elif self.text != self.sent:
+            await self._edit()
+
+        self.msg_id = None
+        self.text = ""
+        self.sent = ""
+        self._failed = False
+        self._queued = False
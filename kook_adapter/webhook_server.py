@@ -0,0 +1,124 @@
+import base64
+import hmac
+import logging
+import zlib
+from aiohttp import web
+from .codec import RAW_FRAME_KEY, json_loads
+
+try:
+    from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+    from cryptography.hazmat.primitives import padding
+except ImportError:
+    Cipher = None
+
+WEBHOOK_CHALLENGE_TYPE = "WEBHOOK_CHALLENGE"
+
+
+def decrypt_payload(encrypted, encrypt_key):
+    """解密Webhook推送的加密消息
+
+    encrypt 字段为 base64 编码，解码后前16字节为IV，其余部分为 base64 编码的密文；
+    密钥为 encrypt_key 右侧补 \\0 至32字节，算法为 AES-256-CBC。
+    """
+    if Cipher is None:
+        raise RuntimeError("解密Webhook消息需要安装 cryptography")
+    raw = base64.b64decode(encrypted)
+    iv, ciphertext = raw[:16], base64.b64decode(raw[16:])
+    key = encrypt_key.encode().ljust(32, b"\0")[:32]
+    decryptor = Cipher(algorithms.AES(key), modes.CBC(iv)).decryptor()
+    padded = decryptor.update(ciphertext) + decryptor.finalize()
+    unpadder = padding.PKCS7(128).unpadder()
+    return unpadder.update(padded) + unpadder.finalize()
+
+
+class KookWebhookServer:
+    """Webhook模式的事件接收端点
+
+    KOOK将事件以HTTP POST推送到该端点，校验后交给 KookClient.feed_event，
+    与WebSocket模式共用同一套过滤、去重与处理流水线。
+    服务本身不保存连接状态，可在负载均衡后部署多个副本分担入站流量。
+    verify_token 必须配置，否则任何人都能向端点推送事件。
+    """
+
+    def __init__(self, client, host="0.0.0.0", port=8080, path="/kook/webhook",
+                 verify_token="", encrypt_key=""):
+        if not verify_token:
+            raise ValueError("Webhook模式必须配置 verify_token（KOOK开发者后台的回调校验Token）")
+        self.client = client
+        self.host = host
+        self.port = port
+        self.path = path
+        self.verify_token = verify_token
+        self.encrypt_key = encrypt_key
+        self._runner = None
+        self.received = 0
+        self.rejected = 0
+
+    async def start(self):
+        """启动HTTP服务"""
+        if self.encrypt_key and Cipher is None:
+            logging.error("[KOOK] 已配置 encrypt_key 但未安装 cryptography，无法解密Webhook消息")
+        app = web.Application()
+        app.router.add_post(self.path, self.handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        logging.info(f"[KOOK] Webhook 服务已启动: http://{self.host}:{self.port}{self.path}")
+
+    async def stop(self):
+        """停止HTTP服务"""
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+            logging.info("[KOOK] Webhook 服务已停止")
+
+    def decode(self, body):
+        """解压并解密请求体，返回 (明文报文, 信令数据)"""
+        if body[:1] == b"\x78":  # zlib 头
+            body = zlib.decompress(body)
+        data = json_loads(body)
+        if "encrypt" in data:
+            if not self.encrypt_key:
+                raise ValueError("收到加密消息但未配置 encrypt_key")
+            body = decrypt_payload(data["encrypt"], self.encrypt_key)
+            data = json_loads(body)
+        return body, data
+
+    async def handle(self, request):
+        """处理KOOK推送的事件"""
+        try:
+            raw, data = self.decode(await request.read())
+        except Exception as e:
+            self.rejected += 1
+            logging.error(f"[KOOK] 解析Webhook消息失败: {e}")
+            return web.Response(status=400)
+
+        d = data.get('d') or {}
+        if not self._verify(d.get('verify_token')):
+            self.rejected += 1
+            logging.warning("[KOOK] Webhook verify_token 校验失败，已拒绝")
+            return web.Response(status=403)
+
+        if d.get('type') == 255 and d.get('channel_type') == WEBHOOK_CHALLENGE_TYPE:
+            logging.info("[KOOK] 收到Webhook地址校验请求")
+            return web.json_response({"challenge": d.get('challenge')})
+
+        if data.get('s') == 0:
+            self.received += 1
+            data[RAW_FRAME_KEY] = raw
+            # 事件进入处理流水线后立即应答，避免KOOK因超时重推
+            await self.client.feed_event(data)
+        return web.Response(status=200)
+
+    def _verify(self, token):
+        """常数时间比较 verify_token"""
+        if not isinstance(token, str):
+            return False
+        return hmac.compare_digest(token.encode(), self.verify_token.encode())
+
+    def stats(self):
+        return {
+            "received": self.received,
+            "rejected": self.rejected,
+        }
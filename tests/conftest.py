@@ -0,0 +1,7 @@
+import os
+import sys
+import tempfile
+
+# 导入 AstrBot 时会在根目录下创建 data/，指向临时目录以免污染仓库
+os.environ.setdefault("ASTRBOT_ROOT", tempfile.mkdtemp(prefix="astrbot_test_"))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,71 @@
+import asyncio
+import base64
+import json
+
+from kook_adapter.asset_uploader import AssetCache, AssetUploader
+
+
+class FakeClient:
+    def __init__(self):
+        self.uploads = []
+
+    async def upload_asset(self, source, filename):
+        self.uploads.append(filename)
+        await asyncio.sleep(0.01)
+        return f"https://img.kookapp.cn/assets/{len(self.uploads)}.png"
+
+
+def image(data):
+    return "base64://" + base64.b64encode(data).decode()
+
+
+def test_same_content_uploaded_once(tmp_path):
+    async def run():
+        client = FakeClient()
+        uploader = AssetUploader(client, str(tmp_path / "assets.json"))
+        urls = await asyncio.gather(*(uploader.resolve(image(b"abc")) for _ in range(3)))
+        assert len(set(urls)) == 1
+        assert await uploader.resolve(image(b"abc")) == urls[0]
+        assert len(client.uploads) == 1
+        await uploader.close()
+
+    asyncio.run(run())
+
+
+def test_kook_urls_used_directly():
+    async def run():
+        uploader = AssetUploader(FakeClient())
+        url = "https://img.kookapp.cn/assets/a.png"
+        assert await uploader.resolve(url) == url
+        assert await uploader.resolve("") is None
+
+    asyncio.run(run())
+
+
+def test_cache_written_after_delay_not_per_upload(tmp_path):
+    path = tmp_path / "assets.json"
+
+    async def run():
+        uploader = AssetUploader(FakeClient(), str(path), save_delay=0.05)
+        await uploader.resolve(image(b"a"))
+        await uploader.resolve(image(b"b"))
+        assert not path.exists()
+        await asyncio.sleep(0.1)
+        assert len(json.loads(path.read_text())) == 2
+        assert not uploader.cache.dirty
+
+        await uploader.resolve(image(b"c"))
+        await uploader.close()  # 关闭时立即写入
+        assert len(json.loads(path.read_text())) == 3
+
+    asyncio.run(run())
+    reloaded = AssetCache(str(path))
+    assert len(reloaded) == 3
+
+
+def test_cache_evicts_by_count():
+    cache = AssetCache(max_entries=2)
+    for digest in ("a", "b", "c"):
+        cache.put(digest, f"https://img.kookapp.cn/{digest}")
+    assert cache.get("a") is None
+    assert cache.get("c") == "https://img.kookapp.cn/c"
@@ -0,0 +1,74 @@
+import json
+
+from kook_adapter.card_parser import parse_card
+
+
+def card(*modules):
+    return json.dumps([{"type": "card", "modules": list(modules)}])
+
+
+def test_text_and_images_in_order():
+    content = parse_card(card(
+        {"type": "header", "text": {"type": "plain-text", "content": "标题"}},
+        {"type": "section", "text": {"type": "kmarkdown", "content": "正文"}},
+        {"type": "container", "elements": [
+            {"type": "image", "src": "https://img/1.png"},
+            {"type": "image", "src": "https://img/2.png"},
+        ]},
+        {"type": "section", "text": {"type": "paragraph", "fields": [
+            {"type": "kmarkdown", "content": "字段1"},
+            {"type": "plain-text", "content": "字段2"},
+        ]}},
+    ))
+    assert content.text == "标题\n正文\n字段1\n字段2"
+    assert content.segments == [
+        ("text", "标题\n正文"),
+        ("image", "https://img/1.png"),
+        ("image", "https://img/2.png"),
+        ("text", "字段1\n字段2"),
+    ]
+    assert content.image_urls() == ["https://img/1.png", "https://img/2.png"]
+
+
+def test_accessory_context_and_media():
+    content = parse_card(card(
+        {"type": "section", "text": {"type": "kmarkdown", "content": "看图"},
+         "accessory": {"type": "image", "src": "https://img/a.png"}},
+        {"type": "section", "text": {"type": "kmarkdown", "content": "点我"},
+         "accessory": {"type": "button", "text": {"type": "plain-text", "content": "按钮"}}},
+        {"type": "context", "elements": [
+            {"type": "image", "src": "https://img/icon.png"},
+            {"type": "plain-text", "content": "说明"},
+        ]},
+        {"type": "file", "src": "https://f/x.zip", "title": "x.zip"},
+        {"type": "audio", "src": "https://f/a.mp3"},
+        {"type": "video", "src": "https://f/v.mp4"},
+        {"type": "invite", "code": "abc"},
+        {"type": "divider"},
+        {"type": "action-group", "elements": []},
+        {"type": "unknown"},
+    ))
+    assert content.segments == [
+        ("text", "看图"),
+        ("image", "https://img/a.png"),
+        ("text", "点我\n说明"),
+        ("file", ("x.zip", "https://f/x.zip")),
+        ("audio", "https://f/a.mp3"),
+        ("video", "https://f/v.mp4"),
+        ("text", "[邀请] abc"),
+    ]
+    assert "按钮" not in content.text
+
+
+def test_accepts_parsed_object_and_single_card():
+    single = {"type": "card", "modules": [
+        {"type": "section", "text": {"type": "plain-text", "content": "hi"}},
+    ]}
+    assert parse_card(single).text == "hi"
+    assert parse_card([single]).text == "hi"
+
+
+def test_empty_card():
+    content = parse_card("[]")
+    assert content.text == ""
+    assert content.segments == []
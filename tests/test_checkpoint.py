@@ -0,0 +1,79 @@
+import asyncio
+import json
+
+from kook_adapter import checkpoint as checkpoint_module
+from kook_adapter.checkpoint import SessionCheckpoint
+from kook_adapter.config import PERFORMANCE_CONFIG
+from kook_adapter.kook_client import KookClient
+
+
+def test_save_and_load(tmp_path):
+    path = tmp_path / "session.json"
+    SessionCheckpoint(str(path)).save("s1", 42)
+    assert SessionCheckpoint(str(path)).load() == ("s1", 42)
+
+
+def test_missing_or_corrupt_file(tmp_path):
+    path = tmp_path / "session.json"
+    assert SessionCheckpoint(str(path)).load() == (None, 0)
+    path.write_text("{")
+    assert SessionCheckpoint(str(path)).load() == (None, 0)
+
+
+def test_expired_checkpoint_ignored(tmp_path, monkeypatch):
+    path = tmp_path / "session.json"
+    SessionCheckpoint(str(path), resume_window=300).save("s1", 42)
+    now = checkpoint_module.time.time()
+    monkeypatch.setattr(checkpoint_module.time, "time", lambda: now + 301)
+    assert SessionCheckpoint(str(path), resume_window=300).load() == (None, 0)
+
+
+def test_unchanged_save_skipped_unless_forced(tmp_path):
+    path = tmp_path / "session.json"
+    cp = SessionCheckpoint(str(path))
+    cp.save("s1", 1)
+    path.write_text(json.dumps({"session_id": "other", "sn": 9, "updated_at": 0}))
+    cp.save("s1", 1)
+    assert json.loads(path.read_text())["session_id"] == "other"
+    cp.save("s1", 1, force=True)
+    assert json.loads(path.read_text())["session_id"] == "s1"
+
+
+def test_clear(tmp_path):
+    path = tmp_path / "session.json"
+    cp = SessionCheckpoint(str(path))
+    cp.save("s1", 1)
+    cp.clear()
+    assert not path.exists()
+    cp.clear()  # 文件不存在时不报错
+
+
+def test_checkpoint_only_covers_finished_events(tmp_path, monkeypatch):
+    monkeypatch.setitem(PERFORMANCE_CONFIG, "enable_message_buffering", True)
+    monkeypatch.setitem(PERFORMANCE_CONFIG, "event_workers", 2)
+
+    async def run():
+        release = asyncio.Event()
+
+        async def callback(data):
+            if data["d"]["target_id"] == "slow":
+                await release.wait()
+
+        client = KookClient("t", callback, checkpoint_path=str(tmp_path / "session.json"))
+        client.session_id = "s1"
+        client.pipeline.start()
+        for sn, target in ((1, "fast"), (2, "slow"), (3, "fast")):
+            client.last_sn = sn
+            await client._dispatch_event({"s": 0, "sn": sn, "d": {"target_id": target}})
+        await asyncio.sleep(0.05)
+        assert client.last_sn == 3
+        assert client.committed_sn == 1  # sn=2 仍在处理，检查点不能越过它
+        client._save_checkpoint(force=True)
+        assert SessionCheckpoint(client.checkpoint.path).load() == ("s1", 1)
+
+        release.set()
+        await client.pipeline.drain(1)
+        assert client.committed_sn == 3
+        await client.pipeline.stop()
+
+    asyncio.run(run())
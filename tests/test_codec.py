@@ -0,0 +1,43 @@
+import json
+import zlib
+
+from kook_adapter.codec import FrameDecoder, json_dumps, json_loads
+
+
+def frames(*payloads):
+    return [json.dumps(p, ensure_ascii=False).encode() for p in payloads]
+
+
+def test_json_round_trip():
+    obj = {"s": 0, "d": {"content": "你好", "n": [1, 2]}}
+    text = json_dumps(obj)
+    assert "你好" in text
+    assert json_loads(text) == obj
+    assert json_loads(text.encode()) == obj
+
+
+def test_independently_compressed_frames():
+    decoder = FrameDecoder()
+    for raw in frames({"s": 1, "d": {}}, {"s": 0, "sn": 1, "d": {"msg_id": "m"}}):
+        assert decoder.decode_with_raw(zlib.compress(raw)) == (raw, json.loads(raw))
+
+
+def test_streaming_compressed_frames():
+    decoder = FrameDecoder()
+    compressor = zlib.compressobj()
+    for raw in frames({"s": 0, "sn": 1}, {"s": 0, "sn": 2}, {"s": 3}):
+        chunk = compressor.compress(raw) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        assert decoder.decode(chunk) == json.loads(raw)
+
+
+def test_text_frames_not_decompressed():
+    decoder = FrameDecoder()
+    assert decoder.decode('{"s": 3}') == {"s": 3}
+
+
+def test_reset_after_broken_stream():
+    decoder = FrameDecoder()
+    compressor = zlib.compressobj()
+    decoder.decode(compressor.compress(b'{"s": 0}') + compressor.flush(zlib.Z_SYNC_FLUSH))
+    decoder.reset()  # 重连后服务端开始新的压缩流
+    assert decoder.decode(zlib.compress(b'{"s": 1}')) == {"s": 1}
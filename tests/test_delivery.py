@@ -0,0 +1,93 @@
+import asyncio
+
+import aiohttp
+
+from kook_adapter.delivery import PENDING, OutboundDelivery
+
+ROUTE = "message/create"
+
+
+class FakeClient:
+    """按脚本返回响应：failures[target_id] 为该频道接下来的失败状态码"""
+
+    def __init__(self, failures=None):
+        self.failures = failures or {}
+        self.sent = []
+
+    async def _request(self, method, route, json=None):
+        script = self.failures.get(json["target_id"])
+        if script:
+            status = script.pop(0)
+            if status == "network":
+                raise aiohttp.ClientConnectionError("reset")
+            return status, {}
+        self.sent.append((json["target_id"], json["content"]))
+        return 200, {"code": 0, "data": {"msg_id": f"m{len(self.sent)}"}}
+
+
+def payload(target, content):
+    return {"target_id": target, "content": content}
+
+
+def delivery_for(client, **kwargs):
+    kwargs.setdefault("delay_base", 0.001)
+    return OutboundDelivery(client, **kwargs)
+
+
+def test_success_returns_data():
+    async def run():
+        delivery = delivery_for(FakeClient())
+        assert await delivery.deliver(ROUTE, payload("1", "a")) == {"msg_id": "m1"}
+        assert delivery.stats()["delivered"] == 1
+
+    asyncio.run(run())
+
+
+def test_client_errors_not_retried():
+    async def run():
+        client = FakeClient({"1": [403]})
+        delivery = delivery_for(client)
+        assert await delivery.deliver(ROUTE, payload("1", "a")) is None
+        assert delivery.pending == 0
+        assert delivery.stats()["failed"] == 1
+
+    asyncio.run(run())
+
+
+def test_retry_keeps_channel_order():
+    async def run():
+        client = FakeClient({"1": [502, "network"]})
+        delivery = delivery_for(client)
+        assert await delivery.deliver(ROUTE, payload("1", "a")) is PENDING
+        # 同频道之后的消息排在重试消息之后，其他频道不受影响
+        assert await delivery.deliver(ROUTE, payload("1", "b")) is PENDING
+        assert await delivery.deliver(ROUTE, payload("2", "x")) == {"msg_id": "m1"}
+        await delivery.drain(1)
+        assert [c for t, c in client.sent if t == "1"] == ["a", "b"]
+        assert delivery.stats() == {"pending": 0, "delivered": 3, "retried": 2, "failed": 0, "dropped": 0}
+
+    asyncio.run(run())
+
+
+def test_gives_up_after_max_attempts():
+    async def run():
+        client = FakeClient({"1": [500, 500, 500]})
+        delivery = delivery_for(client, max_attempts=2)
+        assert await delivery.deliver(ROUTE, payload("1", "a")) is PENDING
+        await delivery.drain(1)
+        assert client.sent == []
+        assert delivery.stats()["failed"] == 1
+
+    asyncio.run(run())
+
+
+def test_queue_limit():
+    async def run():
+        client = FakeClient({"1": [500]})
+        delivery = delivery_for(client, queue_size=1, delay_base=10)
+        assert await delivery.deliver(ROUTE, payload("1", "a")) is PENDING
+        assert await delivery.deliver(ROUTE, payload("1", "b")) is None
+        await delivery.stop()
+        assert delivery.stats()["dropped"] == 2
+
+    asyncio.run(run())
@@ -0,0 +1,116 @@
+import asyncio
+
+import pytest
+
+from kook_adapter.event_pipeline import EventPipeline
+
+
+def event(target, n):
+    return {"d": {"target_id": target, "n": n}}
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        EventPipeline(lambda data: None, policy="drop_all")
+
+
+def test_channel_order_kept_and_channels_concurrent():
+    async def run():
+        seen = []
+        release = asyncio.Event()
+
+        async def handler(data):
+            d = data["d"]
+            if d["target_id"] == "slow":
+                await release.wait()
+            seen.append((d["target_id"], d["n"]))
+
+        # 按频道名分片：slow -> 0，fast -> 1
+        pipeline = EventPipeline(handler, workers=2, key=lambda data: 0 if data["d"]["target_id"] == "slow" else 1)
+        pipeline.start()
+        for n in range(3):
+            await pipeline.submit(event("slow", n))
+            await pipeline.submit(event("fast", n))
+        await asyncio.sleep(0.01)
+        assert seen == [("fast", 0), ("fast", 1), ("fast", 2)]  # 慢频道不阻塞其他频道
+        release.set()
+        assert await pipeline.drain(1)
+        assert [n for target, n in seen if target == "slow"] == [0, 1, 2]
+        assert pipeline.stats()["processed"] == 6
+        await pipeline.stop()
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("policy, kept, dropped", [
+    ("drop_oldest", [1, 2], [0]),
+    ("drop_newest", [0, 1], [2]),
+])
+def test_drop_policies(policy, kept, dropped):
+    async def run():
+        seen = []
+        dropped_events = []
+        release = asyncio.Event()
+
+        async def handler(data):
+            if data["d"]["n"] == "blocker":
+                await release.wait()
+            else:
+                seen.append(data["d"]["n"])
+
+        pipeline = EventPipeline(handler, workers=1, buffer_size=2, policy=policy,
+                                 on_drop=lambda data: dropped_events.append(data["d"]["n"]))
+        pipeline.start()
+        await pipeline.submit(event("c", "blocker"))
+        await asyncio.sleep(0)  # 工作协程取走阻塞任务
+        for n in range(3):
+            await pipeline.submit(event("c", n))
+        release.set()
+        await pipeline.drain(1)
+        assert seen == kept
+        assert dropped_events == dropped
+        assert pipeline.stats()["dropped"] == 1
+        await pipeline.stop()
+
+    asyncio.run(run())
+
+
+def test_block_policy_applies_backpressure():
+    async def run():
+        release = asyncio.Event()
+
+        async def handler(data):
+            await release.wait()
+
+        pipeline = EventPipeline(handler, workers=1, buffer_size=1, policy="block")
+        pipeline.start()
+        await pipeline.submit(event("c", 0))
+        await asyncio.sleep(0)
+        await pipeline.submit(event("c", 1))
+        submit = asyncio.ensure_future(pipeline.submit(event("c", 2)))
+        await asyncio.sleep(0.01)
+        assert not submit.done()
+        release.set()
+        assert await submit
+        await pipeline.drain(1)
+        assert pipeline.stats()["blocked"] == 1
+        assert pipeline.stats()["processed"] == 3
+        await pipeline.stop()
+
+    asyncio.run(run())
+
+
+def test_handler_errors_counted():
+    async def run():
+        async def handler(data):
+            raise RuntimeError("boom")
+
+        pipeline = EventPipeline(handler, workers=1)
+        pipeline.start()
+        await pipeline.submit(event("c", 0))
+        await pipeline.drain(1)
+        assert pipeline.stats()["errors"] == 1
+        await pipeline.stop()
+        assert not pipeline.running
+
+    asyncio.run(run())
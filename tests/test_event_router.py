@@ -0,0 +1,48 @@
+from kook_adapter.event_router import EventRouter
+
+
+def converter(name):
+    async def convert(abm, data, record):
+        pass
+    convert.__name__ = name
+    return convert
+
+
+def build():
+    router = EventRouter()
+    router.register("text", converter("text"), 1)
+    router.register("group_image", converter("group_image"), 2, channel_type="GROUP")
+    router.register("image", converter("image"), 2)
+    router.register("joined", converter("joined"), 255, extra_type="joined_guild")
+    return router
+
+
+def test_exact_and_fallback_matches():
+    router = build()
+    assert router.resolve({"type": 1, "channel_type": "PERSON"}).name == "text"
+    assert router.resolve({"type": 2, "channel_type": "GROUP"}).name == "group_image"
+    assert router.resolve({"type": 2, "channel_type": "PERSON"}).name == "image"
+    assert router.resolve({"type": 255, "channel_type": "GROUP", "extra": {"type": "joined_guild"}}).name == "joined"
+    assert router.resolve({"type": 255, "channel_type": "GROUP", "extra": {"type": "updated_guild"}}) is None
+    assert router.resolve({"type": 99}) is None
+
+
+def test_allowed_routes():
+    router = build()
+    router.set_allowed(["text"])
+    assert router.resolve({"type": 1}).name == "text"
+    assert router.resolve({"type": 2, "channel_type": "GROUP"}) is None
+    router.set_allowed(None)
+    assert router.resolve({"type": 2, "channel_type": "GROUP"}).name == "group_image"
+
+
+def test_register_overrides_and_clears_cache():
+    router = build()
+    assert router.resolve({"type": 1}).name == "text"
+    router.register("kmarkdown_as_text", converter("x"), 1)
+    assert router.resolve({"type": 1}).name == "kmarkdown_as_text"
+    assert router.route_names() == ["group_image", "image", "joined", "kmarkdown_as_text"]
+
+
+def test_unhashable_fields_ignored():
+    assert build().resolve({"type": [1]}) is None
@@ -0,0 +1,76 @@
+import asyncio
+
+from kook_adapter.heartbeat import HeartbeatMonitor
+from kook_adapter.kook_client import KookClient
+
+
+def test_timeout_envelope_clamped():
+    hb = HeartbeatMonitor(min_timeout=1.0, max_timeout=6.0)
+    assert hb.timeout() == 6.0
+    hb._sample(0.05)
+    assert hb.timeout() == 1.0
+    hb._sample(20.0)
+    assert hb.timeout() == 6.0
+
+
+def test_pong_sample_and_ambiguous_pings():
+    async def run():
+        hb = HeartbeatMonitor()
+        hb.ping_sent()
+        assert hb.pong_received() is not None
+        assert hb.srtt is not None
+        srtt = hb.srtt
+        hb.ping_sent()
+        hb.ping_sent()
+        assert hb.pong_received() is None
+        assert hb.srtt == srtt
+
+    asyncio.run(run())
+
+
+def test_wait_pong_and_frames_since_ping():
+    async def run():
+        hb = HeartbeatMonitor()
+        assert await hb.wait_pong(0.01) is False
+        hb.ping_sent()
+        assert await hb.wait_pong(0.01) is False
+        hb.frames += 2
+        assert hb.frames_since_ping() == 2
+        asyncio.get_running_loop().call_later(0.01, hb.pong_received)
+        assert await hb.wait_pong(1) is True
+
+    asyncio.run(run())
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, data):
+        self.sent.append(data)
+
+
+def test_probe_counts_frames_as_alive_and_resets_failures():
+    async def run():
+        client = KookClient("t", None)
+        client.running = True
+        client.ws = FakeWebSocket()
+        client.heartbeat = HeartbeatMonitor(min_timeout=0.01, max_timeout=0.01)
+        client.heartbeat_timeout = 0.02
+        client.max_heartbeat_failures = 2
+        client.heartbeat_failed_count = 1
+
+        async def frame_arrives():
+            await asyncio.sleep(0)
+            client.heartbeat.frames += 1
+
+        asyncio.get_running_loop().create_task(frame_arrives())
+        assert await client._probe() is True
+        assert client.heartbeat_failed_count == 0
+
+        client.heartbeat_failed_count = 0
+        assert await client._probe() is False
+        assert client.heartbeat_failed_count == 2
+        assert len(client.ws.sent) == 3
+
+    asyncio.run(run())
@@ -0,0 +1,22 @@
+import asyncio
+
+from kook_adapter.config import PERFORMANCE_CONFIG
+from kook_adapter.kook_client import KookClient
+
+
+def test_prefilter_drops_events_before_callback(monkeypatch):
+    monkeypatch.setitem(PERFORMANCE_CONFIG, "enable_message_buffering", False)
+
+    async def run():
+        received = []
+
+        async def callback(data):
+            received.append(data["d"]["msg_id"])
+
+        client = KookClient("t", callback, event_filter=lambda data: data["d"]["type"] != 255)
+        await client._dispatch_event({"s": 0, "sn": 1, "d": {"type": 255, "msg_id": "sys"}})
+        await client._dispatch_event({"s": 0, "sn": 2, "d": {"type": 9, "msg_id": "m"}})
+        assert received == ["m"]
+        assert client.filtered_count == 1
+
+    asyncio.run(run())
@@ -0,0 +1,57 @@
+import json
+
+from kook_adapter.kook_message import KookEventRecord, KookMessage
+
+
+def frame_for(d):
+    return json.dumps({"s": 0, "sn": 1, "d": d}).encode()
+
+
+EVENT = {
+    "type": 9,
+    "channel_type": "GROUP",
+    "target_id": "2000",
+    "author_id": "3000",
+    "msg_id": "m1",
+    "content": "正文",
+    "msg_timestamp": 1,
+    "extra": {
+        "guild_id": "g1",
+        "author": {"username": "user"},
+        "mention": ["10000"],
+        "mention_roles": [5],
+        "mention_all": False,
+    },
+}
+
+
+def test_record_keeps_small_fields_and_frame_only():
+    record = KookEventRecord(EVENT, frame_for(EVENT))
+    assert (record.msg_id, record.target_id, record.author_name, record.guild_id) == ("m1", "2000", "user", "g1")
+    assert record.mention == ("10000",)
+    assert record.mention_roles == ("5",)
+    assert "content" not in KookEventRecord.__slots__
+    assert record._raw is None  # 尚未解析原始报文
+
+
+def test_record_parses_frame_on_demand():
+    record = KookEventRecord(EVENT, frame_for(EVENT))
+    assert record.content == "正文"
+    assert record["extra"]["guild_id"] == "g1"
+    assert record.get("missing", 1) == 1
+    assert "msg_id" in record
+
+
+def test_record_without_frame_uses_dict():
+    record = KookEventRecord(EVENT)
+    assert record.raw is EVENT
+
+
+def test_message_components_built_lazily():
+    calls = []
+    message = KookMessage()
+    message.set_message_factory(lambda: calls.append(1) or ["component"])
+    assert calls == []
+    assert message.message == ["component"]
+    assert message.message == ["component"]
+    assert calls == [1]
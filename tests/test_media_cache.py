@@ -0,0 +1,63 @@
+import asyncio
+
+from kook_adapter.card_parser import CardContent, PrefetchedImage
+from kook_adapter.media_cache import MediaCache, MediaPrefetcher
+
+URL = "https://img.kookapp.cn/assets/a.png"
+
+
+class FakeClient:
+    """下载在 release 被设置后才完成"""
+
+    def __init__(self):
+        self.release = asyncio.Event()
+        self.downloads = 0
+
+    async def download_file(self, url, path, max_size=None):
+        self.downloads += 1
+        await self.release.wait()
+        with open(path, "wb") as f:
+            f.write(b"x" * 10)
+        return 10
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = MediaCache(str(tmp_path), max_bytes=20)
+    for name in ("a", "b", "c"):
+        path = cache.path_for(name)
+        with open(path, "wb") as f:
+            f.write(b"x" * 10)
+        cache.put(name, path, 10)
+        if name == "b":
+            assert cache.get("a")  # a 变为最近使用
+    assert cache.get("b") is None
+    assert cache.get("a") and cache.get("c")
+    assert len(MediaCache(str(tmp_path), max_bytes=20)) == 2
+
+
+def test_components_wait_for_inflight_prefetch(tmp_path):
+    async def run():
+        client = FakeClient()
+        media = MediaPrefetcher(client, str(tmp_path))
+        content = CardContent("", [("image", URL), ("image", URL)])
+        media.start(content.image_urls())
+        # 组件在下载完成前构建，仍指向原始URL
+        first, second = content.to_components(media)
+        assert isinstance(first, PrefetchedImage)
+        assert first.file == URL
+
+        waiting = asyncio.ensure_future(first.convert_to_file_path())
+        await asyncio.sleep(0)
+        assert not waiting.done()
+        client.release.set()
+        path = await waiting
+        assert path.startswith(str(tmp_path))
+        assert await second.convert_to_file_path() == path
+        assert client.downloads == 1
+
+        # 之后的消息直接指向本地文件
+        image, = CardContent("", [("image", URL)]).to_components(media)
+        assert not isinstance(image, PrefetchedImage)
+        assert image.file == f"file:///{path}"
+
+    asyncio.run(run())
@@ -0,0 +1,69 @@
+import asyncio
+
+from kook_adapter.rate_limiter import RateLimiter
+
+ROUTE = "message/create"
+
+
+def test_learns_limit_and_remaining_from_headers():
+    limiter = RateLimiter(default_limit=100, default_window=60)
+    limiter.update(ROUTE, {
+        "X-Rate-Limit-Limit": "5",
+        "X-Rate-Limit-Remaining": "2",
+        "X-Rate-Limit-Reset": "3",
+    })
+    bucket = limiter.get_bucket(ROUTE)
+    assert bucket.limit == 5
+    assert bucket.tokens == 2
+    assert 2.9 < bucket.stats()["reset_in"] <= 3
+
+
+def test_remaining_does_not_refund_local_tokens():
+    limiter = RateLimiter()
+    bucket = limiter.get_bucket(ROUTE)
+    bucket.tokens = 1.0
+    limiter.update(ROUTE, {"X-Rate-Limit-Remaining": "10"})
+    assert bucket.tokens == 1.0
+
+
+def test_bucket_name_migrates_path_bucket():
+    limiter = RateLimiter()
+    before = limiter.get_bucket(ROUTE)
+    limiter.update(ROUTE, {"X-Rate-Limit-Bucket": "message/create", "X-Rate-Limit-Limit": "5"})
+    limiter.update("direct-message/create", {"X-Rate-Limit-Bucket": "message/create"})
+    assert limiter.get_bucket(ROUTE) is before
+    assert limiter.get_bucket("direct-message/create") is before
+    assert before.limit == 5
+
+
+def test_malformed_headers_ignored():
+    limiter = RateLimiter(default_limit=100)
+    limiter.update(ROUTE, {"X-Rate-Limit-Limit": "abc", "X-Rate-Limit-Reset": ""})
+    bucket = limiter.get_bucket(ROUTE)
+    assert bucket.limit == 100
+    assert bucket.reset_at is None
+
+
+def test_429_blocks_bucket_or_global():
+    limiter = RateLimiter()
+    limiter.update(ROUTE, {"X-Rate-Limit-Reset": "2"}, status=429)
+    bucket = limiter.get_bucket(ROUTE)
+    assert bucket.throttled_count == 1
+    assert bucket.tokens == 0
+    assert limiter.stats()["global"]["throttled_count"] == 0
+
+    limiter.update(ROUTE, {"X-Rate-Limit-Reset": "1", "X-Rate-Limit-Global": "1"}, status=429)
+    assert limiter.stats()["global"]["throttled_count"] == 1
+
+
+def test_acquire_waits_for_learned_reset():
+    async def run():
+        limiter = RateLimiter()
+        limiter.update(ROUTE, {
+            "X-Rate-Limit-Limit": "1",
+            "X-Rate-Limit-Remaining": "0",
+            "X-Rate-Limit-Reset": "0.2",
+        })
+        return await limiter.acquire(ROUTE)
+
+    assert asyncio.run(run()) >= 0.15
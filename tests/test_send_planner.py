@@ -0,0 +1,65 @@
+import json
+
+from astrbot.api.message_components import Image, Plain
+
+from kook_adapter.config import MESSAGE_CONFIG
+from kook_adapter.kook_client import KookMessageType
+from kook_adapter.send_planner import card_fallback, plan_messages, split_text
+
+
+def test_split_text_prefers_newlines():
+    assert split_text("aaaa\nbbbb\ncc", 10) == ["aaaa\nbbbb", "cc"]
+    assert split_text("abcdefgh", 3) == ["abc", "def", "gh"]
+    assert split_text("short", 10) == ["short"]
+
+
+def test_text_only_merged_and_split(monkeypatch):
+    monkeypatch.setitem(MESSAGE_CONFIG, "max_text_length", 6)
+    plan = plan_messages([Plain(text="abc"), Plain(text="def"), Plain(text="ghi")])
+    assert plan == [
+        (KookMessageType.KMARKDOWN, "abcdef"),
+        (KookMessageType.KMARKDOWN, "ghi"),
+    ]
+
+
+def test_blank_text_dropped():
+    assert plan_messages([Plain(text="  ")]) == []
+
+
+def test_single_image():
+    plan = plan_messages([Image(file="https://img.kookapp.cn/a.png")])
+    assert plan == [(KookMessageType.IMAGE, "https://img.kookapp.cn/a.png")]
+
+
+def test_mixed_content_becomes_card_in_order():
+    image = Image(file="local.png")
+    plan = plan_messages(
+        [Plain(text="前"), image, Plain(text="后")],
+        {id(image): "https://img.kookapp.cn/a.png"},
+    )
+    assert [msg_type for msg_type, _ in plan] == [KookMessageType.CARD]
+    modules = json.loads(plan[0][1])[0]["modules"]
+    assert [m["type"] for m in modules] == ["section", "container", "section"]
+    assert modules[0]["text"]["content"] == "前"
+    assert modules[1]["elements"][0]["src"] == "https://img.kookapp.cn/a.png"
+    assert modules[2]["text"]["content"] == "后"
+
+
+def test_card_split_by_module_and_image_limits(monkeypatch):
+    monkeypatch.setitem(MESSAGE_CONFIG, "max_container_images", 2)
+    monkeypatch.setitem(MESSAGE_CONFIG, "max_card_modules", 2)
+    chain = [Plain(text="t")] + [Image(file=f"https://img.kookapp.cn/{i}.png") for i in range(5)]
+    cards = [json.loads(content)[0] for _, content in plan_messages(chain)]
+    assert len(cards) == 2
+    containers = [m for card in cards for m in card["modules"] if m["type"] == "container"]
+    assert [len(m["elements"]) for m in containers] == [2, 2, 1]
+
+
+def test_card_fallback_keeps_order():
+    chain = [Plain(text="a"), Image(file="https://x/1.png"), Plain(text="b")]
+    (_, content), = plan_messages(chain)
+    assert card_fallback(content) == [
+        (KookMessageType.KMARKDOWN, "a"),
+        (KookMessageType.IMAGE, "https://x/1.png"),
+        (KookMessageType.KMARKDOWN, "b"),
+    ]
@@ -0,0 +1,114 @@
+from kook_adapter import sequencer
+from kook_adapter.sequencer import EventSequencer
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+def event(sn, msg_id=None):
+    return {"s": 0, "sn": sn, "d": {"msg_id": msg_id or f"m{sn}"}}
+
+
+def sns(events):
+    return [e["sn"] for e in events]
+
+
+def test_in_order():
+    seq = EventSequencer()
+    assert sns(seq.push(event(1))) == [1]
+    assert sns(seq.push(event(2))) == [2]
+    assert seq.last_sn == 2
+
+
+def test_reorder():
+    seq = EventSequencer(last_sn=1)
+    assert seq.push(event(3)) == []
+    assert seq.push(event(4)) == []
+    assert seq.pending == 2
+    assert sns(seq.push(event(2))) == [2, 3, 4]
+    assert seq.pending == 0
+    assert seq.reordered == 2
+    assert seq.gap_deadline() is None
+
+
+def test_duplicate_sn():
+    seq = EventSequencer(last_sn=1)
+    seq.push(event(2))
+    seq.push(event(4))
+    assert seq.push(event(2)) == []  # 已投递
+    assert seq.push(event(4)) == []  # 已在缓冲区中
+    assert seq.duplicates == 2
+
+
+def test_duplicate_msg_id_across_sessions():
+    seq = EventSequencer()
+    assert sns(seq.push(event(1, "a"))) == [1]
+    seq.reset()  # 新会话，sn 重新计数
+    assert seq.push(event(1, "a")) == []
+    assert seq.last_sn == 1
+    assert sns(seq.push(event(2, "b"))) == [2]
+
+
+def test_fresh_session_reorders_first_frames():
+    seq = EventSequencer()
+    assert seq.push(event(2)) == []
+    assert sns(seq.push(event(1))) == [1, 2]
+    seq.reset()
+    assert seq.push(event(3, "n3")) == []
+    assert seq.push(event(2, "n2")) == []
+    assert sns(seq.push(event(1, "n1"))) == [1, 2, 3]
+
+
+def test_gap_skipped_after_timeout(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(sequencer, "time", clock)
+    seq = EventSequencer(gap_timeout=1.0, last_sn=1)
+    seq.push(event(4))
+    seq.push(event(5))
+    assert seq.flush_expired() == []
+    assert seq.gap_deadline() == 1.0
+    clock.now += 1.0
+    assert sns(seq.flush_expired()) == [4, 5]
+    assert seq.gap_skipped == 2
+    assert seq.last_sn == 5
+    # 跳过后迟到的事件按重复丢弃
+    assert seq.push(event(3)) == []
+
+
+def test_gap_skipped_on_window_overflow():
+    seq = EventSequencer(window=2, last_sn=1)
+    assert seq.push(event(3)) == []
+    assert seq.push(event(4)) == []
+    assert sns(seq.push(event(5))) == [3, 4, 5]
+    assert seq.gap_skipped == 1
+
+
+def test_msg_id_ttl(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(sequencer, "time", clock)
+    seq = EventSequencer(dedup_ttl=10)
+    assert seq.accept({"d": {"msg_id": "a"}})
+    clock.now += 9
+    assert not seq.accept({"d": {"msg_id": "a"}})
+    clock.now += 2
+    assert seq.accept({"d": {"msg_id": "a"}})
+
+
+def test_msg_id_lru_bound():
+    seq = EventSequencer(dedup_size=2)
+    for msg_id in ("a", "b", "c"):
+        assert seq.accept({"d": {"msg_id": msg_id}})
+    assert not seq.accept({"d": {"msg_id": "c"}})
+    assert seq.accept({"d": {"msg_id": "a"}})  # 最旧的记录已被淘汰
+
+
+def test_events_without_sn_or_msg_id():
+    seq = EventSequencer()
+    data = {"s": 0, "d": {}}
+    assert seq.push(data) == [data]
+    assert seq.push(data) == [data]
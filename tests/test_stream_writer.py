@@ -0,0 +1,79 @@
+import asyncio
+
+from kook_adapter.config import MESSAGE_CONFIG
+from kook_adapter.delivery import PENDING
+from kook_adapter.stream_writer import StreamWriter
+
+
+class FakeClient:
+    def __init__(self, create_result=None):
+        self.create_result = create_result
+        self.sent = []
+        self.updates = []
+
+    async def send_message(self, channel_id, content, msg_type=None, direct=False):
+        self.sent.append(content)
+        if self.create_result is not None and len(self.sent) == 1:
+            return self.create_result
+        return {"msg_id": f"m{len(self.sent)}"}
+
+    async def update_message(self, msg_id, content, direct=False):
+        self.updates.append((msg_id, content))
+        return True
+
+
+def test_first_delta_sent_then_edits_coalesced():
+    async def run():
+        client = FakeClient()
+        writer = StreamWriter(client, "c", interval=0.05)
+        await writer.append("Hel")
+        assert client.sent == ["Hel"]
+        for delta in "lo world":
+            await writer.append(delta)
+        await asyncio.sleep(0.08)
+        await writer.finish()
+        assert client.sent == ["Hel"]
+        assert client.updates[-1] == ("m1", "Hello world")
+        assert len(client.updates) <= 2
+
+    asyncio.run(run())
+
+
+def test_pending_first_send_only_appends_rest():
+    async def run():
+        client = FakeClient(create_result=PENDING)
+        writer = StreamWriter(client, "c", interval=0.01)
+        await writer.append("Hello ")
+        await writer.append("world")
+        await writer.finish()
+        assert client.sent == ["Hello ", "world"]
+        assert client.updates == []
+
+    asyncio.run(run())
+
+
+def test_failed_first_send_resent_on_finish():
+    async def run():
+        client = FakeClient(create_result={})
+        writer = StreamWriter(client, "c", interval=0.01)
+        await writer.append("Hello ")
+        await writer.append("world")
+        await writer.finish()
+        assert client.sent == ["Hello ", "Hello world"]
+
+    asyncio.run(run())
+
+
+def test_long_reply_continues_in_new_message(monkeypatch):
+    monkeypatch.setitem(MESSAGE_CONFIG, "max_text_length", 10)
+
+    async def run():
+        client = FakeClient()
+        writer = StreamWriter(client, "c", interval=0)
+        await writer.append("line one\n")
+        await writer.append("line two")
+        await writer.finish()
+        assert client.sent == ["line one\n", "line two"]
+        assert client.updates == [("m1", "line one")]
+
+    asyncio.run(run())
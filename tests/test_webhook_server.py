@@ -0,0 +1,93 @@
+import asyncio
+import base64
+import json
+
+import pytest
+
+from kook_adapter.webhook_server import KookWebhookServer, decrypt_payload
+
+FIXED_IV = bytes(range(16))
+
+
+def encrypt(plaintext, encrypt_key, iv=FIXED_IV):
+    """按KOOK的方式加密：base64(IV + base64(AES-256-CBC密文))"""
+    from cryptography.hazmat.primitives import padding
+    from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+    key = encrypt_key.encode().ljust(32, b"\0")[:32]
+    padder = padding.PKCS7(128).padder()
+    padded = padder.update(plaintext) + padder.finalize()
+    encryptor = Cipher(algorithms.AES(key), modes.CBC(iv)).encryptor()
+    ciphertext = encryptor.update(padded) + encryptor.finalize()
+    return base64.b64encode(iv + base64.b64encode(ciphertext)).decode()
+
+
+class FakeClient:
+    def __init__(self):
+        self.events = []
+
+    async def feed_event(self, data):
+        self.events.append(data)
+
+
+class FakeRequest:
+    def __init__(self, body):
+        self.body = body
+
+    async def read(self):
+        return self.body
+
+
+def post(server, payload):
+    body = json.dumps(payload).encode()
+    return asyncio.run(server.handle(FakeRequest(body))).status
+
+
+def event(verify_token):
+    return {"s": 0, "sn": 1, "d": {"type": 9, "msg_id": "m1", "verify_token": verify_token}}
+
+
+def test_decrypt_round_trip():
+    pytest.importorskip("cryptography")
+    payload = json.dumps({"s": 0, "d": {"verify_token": "v", "content": "你好"}}).encode()
+    assert decrypt_payload(encrypt(payload, "secret"), "secret") == payload
+
+
+def test_decrypt_long_key_truncated():
+    pytest.importorskip("cryptography")
+    key = "k" * 40
+    assert decrypt_payload(encrypt(b"{}", key), key) == b"{}"
+
+
+def test_wrong_key_rejected():
+    pytest.importorskip("cryptography")
+    server = KookWebhookServer(FakeClient(), verify_token="v", encrypt_key="wrong")
+    body = json.dumps({"encrypt": encrypt(json.dumps(event("v")).encode(), "right")}).encode()
+    with pytest.raises(ValueError):
+        server.decode(body)
+
+
+def test_requires_verify_token():
+    with pytest.raises(ValueError):
+        KookWebhookServer(FakeClient(), verify_token="")
+
+
+def test_verify_token_checked():
+    client = FakeClient()
+    server = KookWebhookServer(client, verify_token="v")
+    assert post(server, event("x")) == 403
+    assert post(server, event(None)) == 403
+    assert post(server, {"s": 0, "d": {}}) == 403
+    assert client.events == []
+    assert post(server, event("v")) == 200
+    assert [e["d"]["msg_id"] for e in client.events] == ["m1"]
+    assert server.stats() == {"received": 1, "rejected": 3}
+
+
+def test_challenge():
+    server = KookWebhookServer(FakeClient(), verify_token="v")
+    body = json.dumps({"s": 0, "d": {
+        "type": 255, "channel_type": "WEBHOOK_CHALLENGE", "challenge": "abc", "verify_token": "v",
+    }}).encode()
+    response = asyncio.run(server.handle(FakeRequest(body)))
+    assert json.loads(response.body) == {"challenge": "abc"}